@@ -1,18 +1,31 @@
 # app.py
 
+import io
 import os
+import csv
+import json
+import math
+import time
+import base64
+import binascii
 import logging
+from decimal import Decimal
+from functools import wraps
 import subprocess
-import numpy as np
 import pandas as pd
 from flask_cors import CORS
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from scripts.train_model import train_model
-from scripts.forecast import get_aqi_forecast
-from scripts.fetch_data import fetch_data_from_apis
-from flask import Flask, request, jsonify, send_from_directory
-from scripts.update_database import update_database, append_aqi_forecast_to_db
+from scripts.jobs import submit_job, get_job
+from scripts.fetch_cache import UpstreamQuotaExceeded, get_current_data
+from scripts.fetch_data import UpstreamError
+from scripts.accuracy import ACCURACY_MAX_DAYS, ACCURACY_WINDOW_DAYS, get_forecast_accuracy
+from scripts.db import get_engine, get_pool_stats
+from scripts.model_registry import get_registry_stats
+from scripts.stations import DEFAULT_LOCATION, load_stations
+from scripts import fetch_cache, metrics, response_cache, serialize
+from sqlalchemy import text
+from scripts.update_database import ensure_schema
+from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory, make_response, stream_with_context
 
 # Load environment variables
 load_dotenv()
@@ -20,181 +33,526 @@ logging.basicConfig(level=logging.DEBUG)
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='static', template_folder='templates')
-CORS(app, resources={r"/api/*": {"origins": "*"}})
-
-# PostgreSQL connection string from environment variables
-DATABASE_URL = os.getenv('DATABASE_URL')
-
-# Create a database engine using SQLAlchemy
-engine = create_engine(DATABASE_URL)
+# The page cursor travels in a response header, which cross-origin clients only see when exposed
+CORS(app, resources={r"/api/*": {"origins": "*", "expose_headers": ["X-Next-Cursor"]}})
+
+# Upper bound on origin dates per backfill request (about ten years of daily origins)
+BACKFILL_MAX_ORIGINS = int(os.getenv("BACKFILL_MAX_ORIGINS", "3660"))
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    # Labelled by route pattern, not path, so /api/jobs/<job_id> stays one series
+    if metrics.METRICS_ENABLED and 'request_start' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe("aqi_http_request_duration_seconds", time.perf_counter() - g.request_start,
+                        route=route, method=request.method)
+        metrics.inc("aqi_http_requests_total", route=route, method=request.method, status=response.status_code)
+    return response
+
+def cached_json_response(key, variant=None):
+    """
+    Serves a JSON view from the in-process response cache as pre-serialized bytes with
+    ETag/Last-Modified, so repeat reads skip the database and conditional GETs get a 304.
+    variant() names the entry of a view that depends on query parameters (e.g. the location).
+    Only 200 responses are cached; writers call response_cache.invalidate(key) when data changes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            name = variant() if variant else None
+            entry = response_cache.get(key, name)
+            if entry is None:
+                generation = response_cache.current_generation(key)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = response_cache.put(key, response.get_data(), generation, name)
+
+            response = app.response_class(entry.body, mimetype='application/json')
+            response.set_etag(entry.etag)
+            response.last_modified = entry.last_modified
+            response.cache_control.no_cache = True  # Browsers revalidate, which is cheap with the ETag
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
 
 # Routes
 @app.route('/')
 def serve_react_app():
     return send_from_directory('../Frontend/dist', 'index.html')
 
-# Route to trigger hourly tasks directly
+def json_bytes_response(body, status=200):
+    """Response for a body already serialized by scripts/serialize.py"""
+    return app.response_class(body, status=status, mimetype='application/json')
+
+def job_accepted(job, created):
+    """202 response pointing at the status endpoint of a queued (or already running) job"""
+    return jsonify({
+        "message": "Job queued." if created else "Job already queued or running; request coalesced.",
+        "job": job,
+        "status_url": f"/api/jobs/{job['id']}",
+    }), 202
+
+
+# The task, forecast and export modules pull in xgboost, scikit-learn and pyarrow, so they are imported
+# by the routes that use them; a worker that only serves reads never loads them (gunicorn.conf.py
+# preloads them in the master instead when PRELOAD_APP is on)
+
+# Route to trigger hourly tasks in the background
 @app.route('/api/run_hourly_tasks', methods=['POST'])
 def run_hourly_tasks():
     try:
-        # Call the functions directly within the app
-        weather_df, pollutant_df = fetch_data_from_apis()
-        update_database(weather_df, pollutant_df)
-
-        forecast = get_aqi_forecast()
-        append_aqi_forecast_to_db(forecast)
-
-        return jsonify({"message": "Hourly tasks completed successfully!"}), 200
+        import hourly_tasks
+        job, created = submit_job('hourly_tasks', hourly_tasks.run_hourly_tasks)
+        return job_accepted(job, created)
     except Exception as e:
-        app.logger.error(f"Error during hourly tasks: {str(e)}")
+        app.logger.error(f"Error queueing hourly tasks: {str(e)}")
         return jsonify({"error": "Error executing hourly tasks."}), 500
 
 
-# Route to trigger daily tasks directly
+# Route to trigger daily tasks in the background
 @app.route('/api/run_daily_tasks', methods=['POST'])
 def run_daily_tasks():
     try:
-        # Call the function to train the model directly
-        train_model()
-
-        return jsonify({"message": "Daily tasks completed successfully!"}), 200
+        import daily_tasks
+        job, created = submit_job('daily_tasks', daily_tasks.run_daily_tasks)
+        return job_accepted(job, created)
     except Exception as e:
-        app.logger.error(f"Error during daily tasks: {str(e)}")
+        app.logger.error(f"Error queueing daily tasks: {str(e)}")
         return jsonify({"error": "Error executing daily tasks."}), 500
 
+
+# Route to backfill forecasts for historical origin dates in the background
+@app.route('/api/backfill_forecasts', methods=['POST'])
+def backfill_forecasts():
+    """
+    JSON body: {"start": "YYYY-MM-DD", "end": "YYYY-MM-DD"} for a daily range of origin dates, or
+    {"dates": [...]} for specific ones; optional "locations" (default: every configured station)
+    """
+    body = request.get_json(silent=True) or {}
+    try:
+        # Valid JSON of the wrong shape (an array body, a single date string, nulls) is a 400 as well
+        if not isinstance(body, dict):
+            raise TypeError("body must be an object")
+        if body.get('dates'):
+            if not (isinstance(body['dates'], list) and all(isinstance(date, str) for date in body['dates'])):
+                raise TypeError("'dates' must be a list of strings")
+            origin_dates = pd.to_datetime(body['dates'], format='%Y-%m-%d')
+        else:
+            if not (isinstance(body['start'], str) and isinstance(body['end'], str)):
+                raise TypeError("'start' and 'end' must be strings")
+            origin_dates = pd.date_range(pd.to_datetime(body['start'], format='%Y-%m-%d'),
+                                         pd.to_datetime(body['end'], format='%Y-%m-%d'), freq='D')
+    except (KeyError, ValueError, TypeError):
+        return jsonify({"error": "Provide 'dates' or 'start' and 'end' as YYYY-MM-DD."}), 400
+    if len(origin_dates) == 0 or len(origin_dates) > BACKFILL_MAX_ORIGINS:
+        return jsonify({"error": f"Between 1 and {BACKFILL_MAX_ORIGINS} origin dates are allowed."}), 400
+
+    locations = body.get('locations')
+    if locations is not None and not (isinstance(locations, list) and all(isinstance(loc, str) for loc in locations)):
+        return jsonify({"error": "'locations' must be a list of station names."}), 400
+
+    try:
+        # Identical backfills coalesce; different ranges queue as separate jobs
+        from scripts.forecast import batch_forecast
+        name = f"backfill_forecasts:{origin_dates.min():%Y-%m-%d}:{origin_dates.max():%Y-%m-%d}:{len(origin_dates)}:{','.join(locations or [])}"
+        job, created = submit_job(name, batch_forecast, list(origin_dates), locations)
+        return job_accepted(job, created)
+    except Exception as e:
+        app.logger.error(f"Error queueing forecast backfill: {str(e)}")
+        return jsonify({"error": "Error queueing forecast backfill."}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Job '{job_id}' not found."}), 404
+    return jsonify(job)
+
 @app.route('/api/get_evaluation_metrics', methods=['GET'])
+@cached_json_response('get_evaluation_metrics')
 def get_evaluation_metrics():
     try:
         # Connect to PostgreSQL database using SQLAlchemy
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             query = """
                 SELECT * FROM model_evaluation
                 ORDER BY timestamp DESC
                 LIMIT 1
             """
-            df = pd.read_sql_query(query, conn)
+            result = conn.execute(text(query))
+            # Normalize column names
+            columns = [(key.strip().lower(), i) for i, key in enumerate(result.keys())]
+            rows = result.fetchall()
 
-            if df.empty:
+            if not rows:
                 return jsonify({"message": "No evaluation metrics available yet."}), 404
 
-            # Normalize column names
-            df.columns = df.columns.str.strip().str.lower()
+            # Rows go straight to JSON bytes (NaN as null, dates as ISO strings)
+            return json_bytes_response(b'{"data":' + serialize.records_json(columns, rows) + b'}')
 
-            # Format the 'date' column if it exists
-            if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d %H:%M:%S')
+    except Exception as e:
+        app.logger.error(f"Error fetching evaluation metrics: {str(e)}")
+        return jsonify({"error": "Internal Server Error, please try again later."}), 500
 
-            # Replace NaN with None for JSON response
-            df = df.replace({np.nan: None})
 
-            return jsonify({"data": df.to_dict(orient='records')})
+@app.route('/api/forecast_accuracy', methods=['GET'])
+def forecast_accuracy():
+    """Rolling MAE/RMSE per forecast horizon (1-7 days) from the precomputed accuracy aggregates"""
+    location = request.args.get('location', DEFAULT_LOCATION)
+    days = request.args.get('days', str(ACCURACY_WINDOW_DAYS))
+    # Parsed here rather than with type=int, which would turn days=abc into the default window
+    if not (days.isdecimal() and 0 < int(days) <= ACCURACY_MAX_DAYS):
+        return jsonify({"error": f"'days' must be an integer between 1 and {ACCURACY_MAX_DAYS}."}), 400
+    days = int(days)
 
+    try:
+        data = get_forecast_accuracy(location, days)
+        if not data:
+            return jsonify({"message": f"No scored forecasts for {location} yet."}), 404
+        return jsonify({"location": location, "days": days, "data": data})
     except Exception as e:
-        app.logger.error(f"Error fetching evaluation metrics: {str(e)}")
+        app.logger.error(f"Error fetching forecast accuracy: {str(e)}")
         return jsonify({"error": "Internal Server Error, please try again later."}), 500
 
 
+@app.route('/api/model_stats', methods=['GET'])
+def model_stats():
+    return jsonify(get_registry_stats())
+
+
+@app.route('/api/db_pool_stats', methods=['GET'])
+def db_pool_stats():
+    return jsonify(get_pool_stats())
+
+
+@app.route('/api/response_cache_stats', methods=['GET'])
+def response_cache_stats():
+    return jsonify(response_cache.get_cache_stats())
+
+
+@app.route('/api/fetch_cache_stats', methods=['GET'])
+def fetch_cache_stats():
+    return jsonify(fetch_cache.get_cache_stats())
+
+
+# Prometheus scrape target: stage, route and query timings of this worker process
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/fetch_current_data', methods=['GET'])
 def fetch_current_data():
     try:
         from_date = request.args.get('from_date')
-        weather_df, pollutant_df = fetch_data_from_apis(from_date=from_date)
+        location = request.args.get('location', DEFAULT_LOCATION)
+        # Checked before the cache, so bad input never costs an upstream call or a cache entry
+        if from_date is not None:
+            try:
+                from_date = f"{pd.to_datetime(from_date, format='%Y-%m-%d'):%Y-%m-%d}"
+            except ValueError:
+                return jsonify({"error": "'from_date' must be a date as YYYY-MM-DD."}), 400
+        if location not in {station["location"] for station in load_stations()}:
+            return jsonify({"error": f"Unknown station location '{location}'."}), 404
+        # Cached per station and from_date; identical concurrent requests share one upstream call
+        weather_df, pollutant_df = get_current_data(from_date=from_date, location=location)
 
         if isinstance(weather_df, pd.DataFrame) and isinstance(pollutant_df, pd.DataFrame):
-            response_data = {
-                "weather_data": weather_df.to_dict(orient='records'),
-                "pollutant_data": pollutant_df.to_dict(orient='records')
-            }
-            return jsonify(response_data)
+            # Serialized from the frames' column arrays, without a dict per row from to_dict()
+            return json_bytes_response(
+                b'{"weather_data":' + serialize.frame_records_json(weather_df)
+                + b',"pollutant_data":' + serialize.frame_records_json(pollutant_df) + b'}'
+            )
         else:
             return jsonify({"message": "Failed to retrieve valid data."}), 500
 
+    except UpstreamQuotaExceeded as e:
+        return jsonify({"error": str(e)}), 503
+    except UpstreamError as e:
+        app.logger.error(f"Error fetching current data: {e}")
+        return jsonify({"error": "The upstream data provider could not be reached, please try again later."}), 502
     except Exception as e:
         app.logger.error(f"Error fetching current data: {e}")
-        return jsonify({"error": str(e)}), 500
+        return jsonify({"error": "Internal Server Error, please try again later."}), 500
+
+
+# A station's latest forecast run in a single round trip
+LATEST_FORECAST_QUERY = """
+    SELECT * FROM aqi_forecast
+    WHERE location = :location
+      AND forecast_date = (SELECT MAX(forecast_date) FROM aqi_forecast WHERE location = :location)
+    ORDER BY predicted_date ASC
+"""
+
+
+def forecast_location():
+    return request.args.get('location', DEFAULT_LOCATION)
 
 
 @app.route('/api/get_forecast', methods=['GET'])
+@cached_json_response('get_forecast', variant=forecast_location)
 def get_forecast():
     try:
         # Connect to PostgreSQL database using SQLAlchemy
-        with engine.connect() as conn:
-            latest_forecast_date_query = """
-                SELECT MAX(forecast_date) AS latest_forecast_date FROM aqi_forecast
-            """
-            latest_date_df = pd.read_sql_query(latest_forecast_date_query, conn)
-            latest_forecast_date = latest_date_df["latest_forecast_date"].iloc[0]
-
-            forecast_query = f"""
-                SELECT * FROM aqi_forecast
-                WHERE forecast_date = '{latest_forecast_date}'
-                ORDER BY predicted_date ASC
-            """
-            forecast_df = pd.read_sql_query(forecast_query, conn)
+        with get_engine().connect() as conn:
+            result = conn.execute(text(LATEST_FORECAST_QUERY), {"location": forecast_location()})
+            columns = [(key, i) for i, key in enumerate(result.keys())]
+            rows = result.fetchall()
 
-            if forecast_df.empty:
+            if not rows:
                 return jsonify({"message": "No forecast available yet."}), 404
 
-            # Replace NaN with None for valid JSON
-            forecast_df = forecast_df.replace({np.nan: None})
-            return jsonify(forecast_df.to_dict(orient='records'))
+            return json_bytes_response(serialize.records_json(columns, rows))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+ALLOWED_TABLES = ['raw_data', 'cleaned_data', 'weather_data', 'pollutant_data', 'aqi_forecast', 'model_evaluation']
+
+COLUMN_ORDER = [
+    'date', 'forecast_date', 'predicted_date', 'predicted_aqi', 'model_name', 'location',
+    'pm25', 'pm10', 'o3', 'no2', 'so2', 'co', 'aqi_pm25', 'aqi_pm10', 'aqi_o3', 'aqi_no2', 'aqi_so2',
+    'aqi_co', 'aqi', 'name', 'tempmax', 'tempmin', 'temp', 'feelslikemax', 'feelslikemin', 'feelslike',
+    'dew', 'humidity', 'precip', 'precipprob', 'precipcover', 'preciptype', 'snow', 'snowdepth',
+    'windgust', 'windspeed', 'winddir', 'sealevelpressure', 'cloudcover', 'visibility', 'solarradiation',
+    'solarenergy', 'uvindex', 'severerisk', 'sunrise', 'sunset', 'moonphase', 'conditions', 'description',
+    'icon', 'stations', 'timestamp', 'mae', 'rmse', 'mape', 'r2'
+]
+
+# Largest page a client can ask for, and rows fetched per round trip when streaming
+VIEW_DATA_MAX_LIMIT = int(os.getenv("VIEW_DATA_MAX_LIMIT", "5000"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+VIEW_DATA_MIMETYPES = {'json': 'application/json', 'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def get_date_column(table_name):
+    # Determine the correct column for filtering based on table
+    if table_name == 'aqi_forecast':
+        return 'forecast_date'
+    elif table_name == 'model_evaluation':
+        return 'timestamp'
+    return 'date'
+
+
+def get_keyset_columns(table_name):
+    """Columns that give each table a unique, date-first sort order for keyset pagination"""
+    if table_name == 'aqi_forecast':
+        return ['forecast_date', 'predicted_date', 'location']
+    elif table_name == 'model_evaluation':
+        return ['timestamp']
+    return ['date', 'location']
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Key values of an X-Next-Cursor; ValueError for anything encode_cursor couldn't have produced"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, json.JSONDecodeError, ValueError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor.")
+    return values
+
+
+def build_view_query(table_name, start_date=None, end_date=None, after=None, limit=None):
+    """SELECT for view_data/export with bound date filters, keyset cursor and ORDER BY done in SQL"""
+    date_column = get_date_column(table_name)
+    key_columns = get_keyset_columns(table_name)
+
+    filters, params = [], {}
+    if start_date:
+        filters.append(f"{date_column} >= :start_date")
+        params["start_date"] = start_date
+    if end_date:
+        if date_column == 'timestamp':
+            # Exclusive bound on the next day, so rows after midnight on end_date are included
+            filters.append(f"{date_column} < CAST(:end_date AS date) + 1")
+        else:
+            filters.append(f"{date_column} <= :end_date")
+        params["end_date"] = end_date
+    if after:
+        after_values = decode_cursor(after)
+        if len(after_values) != len(key_columns):
+            raise ValueError("Invalid cursor.")
+        placeholders = []
+        for i, value in enumerate(after_values):
+            params[f"after_{i}"] = value
+            placeholders.append(f":after_{i}")
+        filters.append(f"({', '.join(key_columns)}) > ({', '.join(placeholders)})")
+
+    query = f"SELECT * FROM {table_name}"
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    query += " ORDER BY " + ", ".join(key_columns)
+    if limit:
+        query += " LIMIT :limit"
+        params["limit"] = limit
+    return query, params
+
+
+def _plain_value(value):
+    # JSON/CSV-friendly cell: NaN becomes null and dates become ISO strings
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def view_columns(keys):
+    """(column, position) pairs of a result's columns that view_data shows, in COLUMN_ORDER"""
+    keys = [key.strip().lower() for key in keys]
+    return [(col, keys.index(col)) for col in COLUMN_ORDER if col in keys]
+
+
+def stream_rows(query, params, output_format):
+    """Yields a JSON list, NDJSON or CSV from a server-side cursor, STREAM_CHUNK_SIZE rows at a time"""
+    with get_engine().connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=STREAM_CHUNK_SIZE).execute(
+            text(query), params
+        )
+        columns = view_columns(result.keys())
+        chunks = result.partitions(STREAM_CHUNK_SIZE)
+
+        if output_format == 'json':
+            yield from serialize.iter_records_json(columns, chunks)
+            return
+        if output_format == 'ndjson':
+            for rows in chunks:
+                yield serialize.ndjson_lines(columns, rows)
+            return
+
+        yield csv_rows(columns, [], header=True)
+        for rows in chunks:
+            yield csv_rows(columns, rows)
+
+
+def csv_rows(columns, rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow([col for col, _ in columns])
+    writer.writerows([[_plain_value(row[i]) for _, i in columns] for row in rows])
+    return buffer.getvalue()
+
+
+def render_rows(columns, rows, output_format):
+    """A whole page of rows in one of the view_data formats"""
+    if output_format == 'json':
+        return serialize.records_json(columns, rows)
+    if output_format == 'ndjson':
+        return serialize.ndjson_lines(columns, rows)
+    return csv_rows(columns, rows, header=True)
+
+
 @app.route('/api/view-data/<table_name>', methods=['GET'])
 def view_data(table_name):
-    try:
-        allowed_tables = ['raw_data', 'cleaned_data', 'weather_data', 'pollutant_data', 'aqi_forecast', 'model_evaluation']
+    """
+    Rows of an allowed table ordered by its date column.
 
-        if table_name not in allowed_tables:
+    Optional query parameters:
+      start_date / end_date  inclusive bounds on the table's date column
+      limit / after          keyset pagination; the next page's cursor is in the X-Next-Cursor header
+      format                 'ndjson' or 'csv' instead of a JSON list (pages work the same in every format)
+
+    Without a limit the rows are streamed from a server-side cursor in any format.
+    """
+    try:
+        if table_name not in ALLOWED_TABLES:
             return jsonify({"error": f"Table '{table_name}' is not allowed to be viewed."}), 400
 
-        # Determine the correct column for filtering based on table
-        if table_name == 'aqi_forecast':
-            date_column = 'forecast_date'
-        elif table_name == 'model_evaluation':
-            date_column = 'timestamp'
-        else:
-            date_column = 'date'
+        ensure_schema(get_engine())
 
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
+        after = request.args.get('after')
+        limit = request.args.get('limit')
+        output_format = request.args.get('format', 'json')
+
+        # Parsed here rather than with type=int, which would turn limit=abc into no limit at all
+        if limit is not None:
+            if not (limit.isdecimal() and 0 < int(limit) <= VIEW_DATA_MAX_LIMIT):
+                return jsonify({"error": f"'limit' must be an integer between 1 and {VIEW_DATA_MAX_LIMIT}."}), 400
+            limit = int(limit)
+        if output_format not in VIEW_DATA_MIMETYPES:
+            return jsonify({"error": "'format' must be one of json, ndjson or csv."}), 400
+
+        try:
+            query, params = build_view_query(table_name, start_date, end_date, after, limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        mimetype = VIEW_DATA_MIMETYPES[output_format]
+        if limit is None:
+            return Response(stream_with_context(stream_rows(query, params, output_format)), mimetype=mimetype)
+
+        # A page is small and needs its last row for the cursor header, so it's fetched whole
+        with get_engine().connect() as conn:
+            result = conn.execute(text(query), params)
+            columns = view_columns(result.keys())
+            rows = result.fetchall()
+        response = app.response_class(render_rows(columns, rows, output_format), mimetype=mimetype)
+
+        # A full page means there may be more rows; hand back the cursor of its last row
+        if len(rows) == limit:
+            positions = dict(columns)
+            response.headers['X-Next-Cursor'] = encode_cursor(
+                [rows[-1][positions[col]] for col in get_keyset_columns(table_name)]
+            )
+        return response
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/export/<table_name>', methods=['GET'])
+def export_data(table_name):
+    """
+    Bulk export of an allowed table as Parquet (default) or Arrow IPC, with the same
+    start_date/end_date filters and column order as view_data. Whole past months are cached on disk.
+    """
+    try:
+        from scripts.export import EXPORT_FORMATS, export_table
+        if table_name not in ALLOWED_TABLES:
+            return jsonify({"error": f"Table '{table_name}' is not allowed to be exported."}), 400
 
-        query = f"SELECT * FROM {table_name}"
-        filters = []
-
-        if start_date:
-            filters.append(f"{date_column} >= '{start_date}'")
-        if end_date:
-            filters.append(f"{date_column} <= '{end_date}'")
-
-        if filters:
-            query += " WHERE " + " AND ".join(filters)
-
-        with engine.connect() as conn:
-            df = pd.read_sql_query(query, conn)
-
-        # Normalize column names
-        df.columns = df.columns.str.strip().str.lower()
-
-        column_order = [
-            'date', 'forecast_date', 'predicted_date', 'predicted_aqi', 'model_name', 'location',
-            'pm25', 'pm10', 'o3', 'no2', 'so2', 'co', 'aqi_pm25', 'aqi_pm10', 'aqi_o3', 'aqi_no2', 'aqi_so2',
-            'aqi_co', 'aqi', 'name', 'tempmax', 'tempmin', 'temp', 'feelslikemax', 'feelslikemin', 'feelslike',
-            'dew', 'humidity', 'precip', 'precipprob', 'precipcover', 'preciptype', 'snow', 'snowdepth',
-            'windgust', 'windspeed', 'winddir', 'sealevelpressure', 'cloudcover', 'visibility', 'solarradiation',
-            'solarenergy', 'uvindex', 'severerisk', 'sunrise', 'sunset', 'moonphase', 'conditions', 'description',
-            'icon', 'stations', 'timestamp', 'mae', 'rmse', 'mape', 'r2'
-        ]
-
-        column_order = [col.strip().lower() for col in column_order]
-        existing_columns = [col for col in column_order if col in df.columns]
-        df = df[existing_columns]
-        df = df.sort_values(by=date_column, ascending=True) 
-        df = df.replace({np.nan: None})
-        return jsonify(df.to_dict(orient='records'))
+        output_format = request.args.get('format', 'parquet')
+        if output_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"'format' must be one of {', '.join(EXPORT_FORMATS)}."}), 400
+
+        ensure_schema(get_engine())
+
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        query, params = build_view_query(table_name, start_date, end_date)
+        path, is_temporary = export_table(
+            table_name, query, params, COLUMN_ORDER, output_format, start_date=start_date, end_date=end_date
+        )
+
+        extension, mimetype = EXPORT_FORMATS[output_format]
+        response = send_file(
+            path, mimetype=mimetype, as_attachment=True, download_name=f"{table_name}.{extension}",
+            conditional=not is_temporary
+        )
+        if is_temporary:
+            response.call_on_close(lambda: os.remove(path))
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
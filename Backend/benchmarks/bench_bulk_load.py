@@ -0,0 +1,104 @@
+# bench_bulk_load.py
+#
+# Old to_sql import vs. the chunked COPY loader on synthetic CSVs, against DATABASE_URL:
+#   python -m benchmarks.bench_bulk_load --rows 100000 1000000 --replace-tables
+#
+# Both paths DROP and recreate weather_data, pollutant_data, raw_data and cleaned_data, so point
+# DATABASE_URL at a scratch database. Each run happens in a fresh process so peak RSS is its own.
+
+import os
+import sys
+import time
+import resource
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+from scripts.update_database import CLEANED_FEATURES, WEATHER_NUMERIC_COLUMNS, POLLUTANT_NUMERIC_COLUMNS
+
+DAYS_PER_STATION = 3650
+
+
+def write_synthetic_csvs(rows, directory, seed=42):
+    """Weather and pollutant CSVs with `rows` daily rows each, spread over as many stations as needed"""
+    rng = np.random.default_rng(seed)
+    stations = -(-rows // DAYS_PER_STATION)
+    locations = np.repeat([f"Station {i}" for i in range(stations)], DAYS_PER_STATION)[:rows]
+    dates = np.tile(pd.date_range("2010-01-01", periods=DAYS_PER_STATION, freq="D").strftime("%Y-%m-%d"), stations)[:rows]
+
+    weather = pd.DataFrame({"location": locations, "date": dates, "name": "synthetic", "conditions": "Clear"})
+    for col in WEATHER_NUMERIC_COLUMNS:
+        weather[col] = rng.gamma(2.0, 10.0, rows).round(2)
+    pollutant = pd.DataFrame({"location": locations, "date": dates})
+    for col in POLLUTANT_NUMERIC_COLUMNS:
+        pollutant[col] = rng.gamma(2.0, 40.0, rows).round(2)
+
+    paths = os.path.join(directory, "weather_data.csv"), os.path.join(directory, "pollutant_data.csv")
+    weather.to_csv(paths[0], index=False)
+    pollutant.to_csv(paths[1], index=False)
+    return paths
+
+
+def to_sql_import(weather_csv_path, pollutant_csv_path):
+    # The previous load_and_merge_data_from_csv Postgres path: whole files in memory, to_sql inserts
+    from scripts.db import get_engine
+    weather_df = pd.read_csv(weather_csv_path, parse_dates=["date"])
+    pollutant_df = pd.read_csv(pollutant_csv_path, parse_dates=["date"])
+    merged_df = pd.merge(weather_df, pollutant_df, on=["location", "date"], how="inner")
+    cleaned_df = merged_df[["location"] + [col for col in CLEANED_FEATURES if col in merged_df.columns]].copy()
+    with get_engine().begin() as conn:
+        weather_df.to_sql("weather_data", conn, if_exists="replace", index=False)
+        pollutant_df.to_sql("pollutant_data", conn, if_exists="replace", index=False)
+        merged_df.to_sql("raw_data", conn, if_exists="replace", index=False)
+        cleaned_df.to_sql("cleaned_data", conn, if_exists="replace", index=False)
+
+
+def copy_import(weather_csv_path, pollutant_csv_path):
+    from scripts.bulk_load import bulk_load_csv
+    bulk_load_csv(weather_csv_path, pollutant_csv_path, resume=False, rebuild_features=False)
+
+
+def _child(func_name, args, queue):
+    sys.stdout = open(os.devnull, "w")  # Keep the per-chunk progress lines out of the table
+    start = time.perf_counter()
+    result = globals()[func_name](*args)
+    queue.put((result, time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def run(func_name, *args):
+    """
+    Runs a function of this module in a fresh process. The CSVs are generated in one too:
+    peak RSS survives fork+exec, so a parent holding the synthetic frames would inflate every child.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(func_name, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--skip-to-sql", action="store_true", help="only time the COPY loader")
+    parser.add_argument("--replace-tables", action="store_true", help="required: the data tables are dropped")
+    args = parser.parse_args()
+
+    if not args.replace_tables or not os.getenv("DATABASE_URL"):
+        parser.error("set DATABASE_URL to a scratch database and pass --replace-tables")
+
+    print(f"{'rows':>9} {'method':>7} {'seconds':>8} {'rows/s':>10} {'peak RSS (MB)':>14}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            paths, _, _ = run("write_synthetic_csvs", rows, directory)
+            methods = ["copy_import"] if args.skip_to_sql else ["to_sql_import", "copy_import"]
+            for method in methods:
+                _, seconds, rss = run(method, *paths)
+                print(f"{rows:>9} {method[:-len('_import')]:>7} {seconds:>8.2f} {rows / seconds:>10.0f} {rss:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
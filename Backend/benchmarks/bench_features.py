@@ -0,0 +1,64 @@
+# bench_features.py
+#
+# Micro-benchmark of the feature engines on synthetic daily history:
+#   python -m benchmarks.bench_features --years 10 20 40
+
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from scripts.features import build_feature_matrix
+from scripts.train_model import engineer_additional_features, create_lag_features
+
+CLEANED_COLUMNS = [
+    "pm25", "pm10", "co", "no2", "so2", "o3", "AQI", "tempmax", "tempmin", "temp", "humidity", "dew",
+    "windspeed", "winddir", "windgust", "cloudcover", "visibility", "sealevelpressure"
+]
+
+
+def synthetic_history(days, seed=42):
+    """cleaned_data-shaped frame (as returned by load_data) with a few gaps to exercise dropna"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.gamma(2.0, 40.0, days) for col in CLEANED_COLUMNS})
+    df.insert(0, "date", pd.date_range("2000-01-01", periods=days, freq="D"))
+    df.loc[rng.choice(days, size=days // 200, replace=False), "windgust"] = np.nan
+    return df
+
+
+def pandas_path(df):
+    data = create_lag_features(engineer_additional_features(df.copy()))
+    return data.drop(columns=["date"])
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=[10, 20, 40])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'years':>6} {'rows':>8} {'pandas (ms)':>12} {'numpy (ms)':>11} {'speedup':>8}")
+    for years in args.years:
+        df = synthetic_history(years * 365)
+        pandas_time, expected = best_of(lambda: pandas_path(df), args.repeat)
+        numpy_time, features = best_of(lambda: build_feature_matrix(df), args.repeat)
+
+        # Parity: same columns, same rows, same values (to float32 precision)
+        assert features.columns == list(expected.columns), "column order differs"
+        assert np.allclose(features.values, expected.to_numpy(dtype=np.float64), rtol=1e-5, equal_nan=False), \
+            "feature values differ"
+
+        print(f"{years:>6} {len(df):>8} {pandas_time * 1e3:>12.2f} {numpy_time * 1e3:>11.2f} "
+              f"{pandas_time / numpy_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_import_time.py
+#
+# Web-worker startup cost: `python -X importtime -c "import app"` in fresh interpreters.
+#   python -m benchmarks.bench_import_time --repeat 5 --top 15
+#
+# Prints the median cumulative import time of each target and its slowest top-level imports,
+# and exits non-zero if importing app pulls in any of the --forbid packages (the ML and export
+# stacks are meant to load lazily, in the routes that use them or in gunicorn's preload).
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    "app": "import app",
+    "app + tasks (preload)": "import app, daily_tasks, hourly_tasks",
+}
+
+FORBIDDEN = ["xgboost", "sklearn", "scipy", "joblib"]
+
+
+def import_times(statement):
+    """Runs one interpreter; returns {module: (self_us, cumulative_us, depth)} for every module it imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list per target")
+    parser.add_argument("--forbid", nargs="*", default=FORBIDDEN, help="packages 'import app' must not load")
+    args = parser.parse_args()
+
+    violations = []
+    for label, statement in TARGETS.items():
+        runs = [import_times(statement) for _ in range(args.repeat)]
+        # Interpreter startup (site, encodings) is left out; what the targets import is depth 1
+        targets = statement[len("import "):].split(", ")
+        totals = [sum(run[name][1] for name in targets) for run in runs]
+        print(f"\n{label}: {statistics.median(totals) / 1e6:.3f}s median of {args.repeat} "
+              f"(min {min(totals) / 1e6:.3f}s), {len(runs[0])} modules")
+
+        cumulative = defaultdict(list)
+        for run in runs:
+            for name, (_, cum, depth) in run.items():
+                if depth == 1:
+                    cumulative[name].append(cum)
+        slowest = sorted(cumulative.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+        for name, values in slowest[:args.top]:
+            print(f"  {statistics.median(values) / 1e3:>9.1f} ms  {name}")
+
+        if statement == TARGETS["app"]:
+            loaded = {name.split(".")[0] for name in runs[0]}
+            violations = sorted(loaded & set(args.forbid))
+
+    if violations:
+        print(f"\n'import app' loads {', '.join(violations)}; import them in the routes that need them")
+        sys.exit(1)
+    print(f"\n'import app' loads none of: {', '.join(args.forbid)}")
+
+
+if __name__ == "__main__":
+    main()
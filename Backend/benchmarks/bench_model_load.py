@@ -0,0 +1,48 @@
+# bench_model_load.py
+#
+# Cold-load time and size of a pickled XGBRegressor vs. the UBJSON artifact + manifest:
+#   python -m benchmarks.bench_model_load --estimators 200 800
+
+import os
+import joblib
+import argparse
+import tempfile
+import numpy as np
+from xgboost import XGBRegressor
+from benchmarks.bench_features import best_of, synthetic_history
+from scripts import model_registry
+from scripts.train_model import DEFAULT_PARAMS, prepare_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--estimators", type=int, nargs="+", default=[200, 800])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    X, y = prepare_features(data=synthetic_history(5 * 365))
+
+    print(f"{'trees':>6} {'pickle (KB)':>12} {'ubj (KB)':>9} {'pickle (ms)':>12} {'ubj (ms)':>9} {'speedup':>8}")
+    for estimators in args.estimators:
+        model = XGBRegressor(**{**DEFAULT_PARAMS, "n_estimators": estimators}).fit(X, y)
+        with tempfile.TemporaryDirectory() as model_dir:
+            pickle_path = os.path.join(model_dir, "xgboost_model.pkl")
+            joblib.dump(model, pickle_path)
+            manifest = model_registry.publish_model(model, model_dir=model_dir)
+
+            pickle_time, from_pickle = best_of(lambda: joblib.load(pickle_path), args.repeat)
+            ubj_time, (from_ubj, _) = best_of(lambda: model_registry._load_artifact(model_dir), args.repeat)
+
+            # Both must predict exactly what the trained model does
+            expected = model.predict(X)
+            assert np.array_equal(from_pickle.predict(X), expected), "pickle predictions differ"
+            assert np.array_equal(from_ubj.predict(X), expected), "ubj predictions differ"
+
+            pickle_kb = os.path.getsize(pickle_path) / 1024
+            ubj_kb = os.path.getsize(os.path.join(model_dir, manifest["booster"])) / 1024
+            print(f"{estimators:>6} {pickle_kb:>12.0f} {ubj_kb:>9.0f} {pickle_time * 1e3:>12.2f} {ubj_time * 1e3:>9.2f} "
+                  f"{pickle_time / ubj_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
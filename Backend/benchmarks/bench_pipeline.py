@@ -0,0 +1,276 @@
+# bench_pipeline.py
+#
+# End-to-end pipeline benchmark on synthetic daily histories, against DATABASE_URL:
+#   python -m benchmarks.bench_pipeline --rows 1000 10000 100000 1000000 --replace-tables --output before.json
+#   python -m benchmarks.bench_pipeline --rows 1000 10000 --replace-tables --output after.json --compare before.json
+#
+# For each history size: seed the database (bulk COPY load), preprocess the raw weather and
+# pollutant frames, run one hourly ingest (fetch through a stub transport, then update_database),
+# prepare_data, train_model and get_aqi_forecast. Each stage runs in a fresh process, so its peak
+# RSS is its own; input files are read before the clock starts.
+#
+# The history is split over stations of at most --max-station-days days; the first one is the
+# default location, the one the model is trained and forecast on. The data tables are dropped and
+# model_evaluation gets rows, so point DATABASE_URL at a scratch Postgres (the app's SQL is
+# Postgres-only, so there is no SQLite mode). Models are published to a temporary MODEL_DIR.
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+from scripts.stations import DEFAULT_LOCATION
+from scripts.update_database import WEATHER_NUMERIC_COLUMNS, WEATHER_TEXT_COLUMNS, POLLUTANT_NUMERIC_COLUMNS
+
+MAX_STATION_DAYS = 36500
+
+STAGES = [
+    "bulk_load", "preprocess_weather", "preprocess_pollutant", "fetch", "update_database",
+    "prepare_data", "train_model", "get_aqi_forecast",
+]
+
+
+def _today():
+    # Same clock as the fetch layer, so the stubbed hourly ingest adds the day after the history
+    return datetime.now(ZoneInfo("Asia/Kolkata")).date()
+
+
+def station_names(rows, max_station_days):
+    stations = -(-rows // max_station_days)
+    return [DEFAULT_LOCATION] + [f"Station {i}" for i in range(1, stations)]
+
+
+def write_history_csvs(rows, directory, max_station_days, seed=42):
+    """Weather and pollutant CSVs with `rows` daily rows each, every station's history ending yesterday"""
+    rng = np.random.default_rng(seed)
+    locations, dates = [], []
+    remaining = rows
+    for location in station_names(rows, max_station_days):
+        days = min(remaining, max_station_days)
+        end = _today() - timedelta(days=1)
+        locations.append(np.repeat(location, days))
+        dates.append(pd.date_range(end=end, periods=days, freq="D").strftime("%Y-%m-%d"))
+        remaining -= days
+    locations, dates = np.concatenate(locations), np.concatenate(dates)
+
+    weather = pd.DataFrame({"location": locations, "date": dates})
+    for col in WEATHER_NUMERIC_COLUMNS:
+        weather[col] = rng.gamma(2.0, 10.0, rows).round(2)
+    for col in WEATHER_TEXT_COLUMNS:
+        weather[col] = "synthetic"
+    # Yearly cycle plus persistence in AQI, so training sees realistic targets
+    season = 150 + 100 * np.cos(2 * np.pi * pd.DatetimeIndex(dates).dayofyear.to_numpy() / 365.25)
+    pollutant = pd.DataFrame({"location": locations, "date": dates})
+    for col in POLLUTANT_NUMERIC_COLUMNS:
+        pollutant[col] = (season * rng.uniform(0.5, 1.0) + rng.normal(0, 20, rows)).clip(1).round(2)
+
+    paths = os.path.join(directory, "weather_data.csv"), os.path.join(directory, "pollutant_data.csv")
+    weather.to_csv(paths[0], index=False)
+    pollutant.to_csv(paths[1], index=False)
+    return paths
+
+
+class StubTransport(BaseAdapter):
+    """Answers the weather and pollutant APIs with one day of synthetic readings, without any network"""
+
+    def __init__(self, seed=42):
+        super().__init__()
+        self.rng = np.random.default_rng(seed)
+
+    def send(self, request, **kwargs):
+        if "/feed/" in request.url:
+            values = {col: {"v": round(float(self.rng.gamma(2.0, 40.0)), 1)} for col in ("pm25", "pm10", "o3", "no2", "so2", "co")}
+            payload = {"status": "ok", "data": {"aqi": int(self.rng.integers(50, 400)), "iaqi": values}}
+        else:
+            day = {col: round(float(self.rng.gamma(2.0, 10.0)), 2) for col in WEATHER_NUMERIC_COLUMNS}
+            day.update({"datetime": _today().strftime("%Y-%m-%d"), "conditions": "Clear"})
+            payload = {"resolvedAddress": "synthetic", "days": [day]}
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps(payload).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _stations(rows, max_station_days):
+    return [{"location": location, "station": f"@{i}", "weather_location": location}
+            for i, location in enumerate(station_names(rows, max_station_days))]
+
+
+# Each stage returns (rows it processed, seconds); setup such as reading its input is not timed
+def bulk_load(paths, rows, max_station_days):
+    from scripts.bulk_load import bulk_load_csv
+    counts, seconds = _timed(bulk_load_csv, *paths, resume=False, rebuild_features=False)
+    return counts["weather_data"] + counts["pollutant_data"], seconds
+
+
+def preprocess_weather(paths, rows, max_station_days):
+    from scripts.preprocess import preprocess_weather_data
+    df = pd.read_csv(paths[0])
+    _, seconds = _timed(preprocess_weather_data, df)
+    return len(df), seconds
+
+
+def preprocess_pollutant(paths, rows, max_station_days):
+    from scripts.preprocess import preprocess_pollutant_data
+    df = pd.read_csv(paths[1])
+    _, seconds = _timed(preprocess_pollutant_data, df)
+    return len(df), seconds
+
+
+def fetch(paths, rows, max_station_days):
+    from scripts.fetch_data import fetch_all_stations, set_transport
+    set_transport(StubTransport())
+    (weather_df, _), seconds = _timed(fetch_all_stations, _stations(rows, max_station_days))
+    return len(weather_df), seconds
+
+
+def update_database(paths, rows, max_station_days):
+    from scripts.fetch_data import fetch_all_stations, set_transport
+    from scripts.update_database import update_database as update
+    set_transport(StubTransport())
+    weather_df, pollutant_df = fetch_all_stations(_stations(rows, max_station_days))
+    keys, seconds = _timed(update, weather_df, pollutant_df)
+    if not keys:
+        raise RuntimeError("update_database wrote nothing")
+    return len(keys), seconds
+
+
+def prepare_data(paths, rows, max_station_days):
+    from scripts.train_model import prepare_data as prepare
+    (X_train, X_test, _, _), seconds = _timed(prepare)
+    return len(X_train) + len(X_test), seconds
+
+
+def train_model(paths, rows, max_station_days):
+    from scripts.train_model import load_data, train_model as train
+    _, seconds = _timed(train)
+    return len(load_data(columns=['AQI'])), seconds
+
+
+def get_aqi_forecast(paths, rows, max_station_days):
+    from scripts.forecast import get_aqi_forecast as forecast
+    result, seconds = _timed(forecast)
+    return len(result), seconds
+
+
+def _child(func_name, args, queue):
+    sys.stdout = open(os.devnull, "w")  # Keep the stages' progress lines out of the table
+    try:
+        result = globals()[func_name](*args)
+        queue.put((result, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, None))
+    except Exception as e:
+        queue.put((None, None, f"{type(e).__name__}: {e}"))
+
+
+def run(func_name, *args):
+    """Runs a function of this module in a fresh process; returns (result, peak RSS in MB)"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_child, args=(func_name, args, queue))
+    process.start()
+    result, rss, error = queue.get()
+    process.join()
+    if error:
+        raise RuntimeError(f"{func_name} failed: {error}")
+    return result, rss
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints seconds and peak RSS of each (rows, stage) next to a saved run"""
+    with open(baseline_path) as f:
+        baseline = {(r["rows"], r["stage"]): r for r in json.load(f)["results"]}
+    print(f"\nvs. {baseline_path}")
+    print(f"{'rows':>9} {'stage':>20} {'seconds':>17} {'ratio':>6} {'peak RSS (MB)':>15} {'ratio':>6}")
+    for result in results:
+        old = baseline.get((result["rows"], result["stage"]))
+        if old is None:
+            continue
+        print(f"{result['rows']:>9} {result['stage']:>20} {old['seconds']:>8.3f} {result['seconds']:>8.3f} "
+              f"{result['seconds'] / old['seconds']:>5.2f}x {old['peak_rss_mb']:>7.0f} {result['peak_rss_mb']:>7.0f} "
+              f"{result['peak_rss_mb'] / old['peak_rss_mb']:>5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--max-station-days", type=int, default=MAX_STATION_DAYS)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="stages to time (later stages still need the earlier ones' data)")
+    parser.add_argument("--output", default="bench_pipeline.json", help="where to save the results as JSON")
+    parser.add_argument("--compare", help="a previous --output file to print ratios against")
+    parser.add_argument("--replace-tables", action="store_true", help="required: the data tables are dropped")
+    args = parser.parse_args()
+
+    if not args.replace_tables or not os.getenv("DATABASE_URL"):
+        parser.error("set DATABASE_URL to a scratch database and pass --replace-tables")
+
+    results = []
+    print(f"{'rows':>9} {'stage':>20} {'stage rows':>10} {'seconds':>8} {'rows/s':>10} {'peak RSS (MB)':>14}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            # Children inherit the environment, so every stage publishes and loads models here
+            os.environ["MODEL_DIR"] = os.path.join(directory, "models")
+            paths, _ = run("write_history_csvs", rows, directory, args.max_station_days)
+            # The database is always seeded, even when bulk_load isn't among the stages timed
+            stages = [stage for stage in STAGES if stage in args.stages or stage == "bulk_load"]
+            for stage in stages:
+                (stage_rows, seconds), rss = run(stage, paths, rows, args.max_station_days)
+                if stage not in args.stages:
+                    continue
+                results.append({
+                    "rows": rows, "stage": stage, "stage_rows": stage_rows, "seconds": round(seconds, 4),
+                    "rows_per_second": round(stage_rows / seconds, 1), "peak_rss_mb": round(rss, 1),
+                })
+                print(f"{rows:>9} {stage:>20} {stage_rows:>10} {seconds:>8.3f} {stage_rows / seconds:>10.0f} {rss:>14.0f}")
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": _commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "max_station_days": args.max_station_days,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# bench_retrain.py
+#
+# Full daily refit vs. warm-start incremental updates as history grows, on synthetic data:
+#   python -m benchmarks.bench_retrain --years 2 5 10 --weeks 4
+#
+# Each run trains once on all but the last `weeks` of history, then walks forward a week at a
+# time. The full path refits from scratch on everything seen so far; the incremental path boosts
+# INCREMENTAL_ROUNDS more trees on the new week only. Both are scored on the weeks that follow.
+
+import time
+import argparse
+import numpy as np
+from xgboost import XGBRegressor
+from benchmarks.bench_features import synthetic_history
+from scripts.train_model import DEFAULT_PARAMS, INCREMENTAL_ROUNDS, continue_training, evaluate, prepare_features
+
+
+def seasonal_history(days, seed=42):
+    """synthetic_history with a yearly cycle and day-to-day persistence in AQI, so there is something to learn"""
+    rng = np.random.default_rng(seed)
+    df = synthetic_history(days, seed)
+    season = 150 + 100 * np.cos(2 * np.pi * df["date"].dt.dayofyear.to_numpy() / 365.25)
+    noise = np.zeros(days)
+    for i in range(1, days):
+        noise[i] = 0.8 * noise[i - 1] + rng.normal(0, 20)
+    df["AQI"] = season + noise
+    df["pm25"] = 0.6 * df["AQI"] + rng.normal(0, 10, days)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--weeks", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'years':>6} {'rows':>7} {'full (s)':>9} {'incr (s)':>9} {'speedup':>8} {'full RMSE':>10} {'incr RMSE':>10}")
+    for years in args.years:
+        X, y = prepare_features(data=seasonal_history(years * 365))
+        start_row = len(X) - 7 * (args.weeks + 1)
+
+        base = XGBRegressor(**DEFAULT_PARAMS).fit(X[:start_row], y[:start_row])
+        full_model, incr_model = base, base
+        full_time = incr_time = 0.0
+        full_scores, incr_scores = [], []
+
+        for week in range(args.weeks):
+            lo, hi = start_row + 7 * week, start_row + 7 * (week + 1)
+
+            start = time.perf_counter()
+            full_model = XGBRegressor(**DEFAULT_PARAMS).fit(X[:hi], y[:hi])
+            full_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            incr_model = continue_training(incr_model, X[lo:hi], y[lo:hi])
+            incr_time += time.perf_counter() - start
+
+            # Score both on the following week, which neither has seen
+            X_next, y_next = X[hi:hi + 7], y[hi:hi + 7]
+            full_scores.append(evaluate(y_next, full_model.predict(X_next))["rmse"])
+            incr_scores.append(evaluate(y_next, incr_model.predict(X_next))["rmse"])
+
+        print(f"{years:>6} {len(X):>7} {full_time:>9.2f} {incr_time:>9.2f} {full_time / incr_time:>7.1f}x "
+              f"{np.mean(full_scores):>10.2f} {np.mean(incr_scores):>10.2f}")
+    print(f"(incremental updates add {INCREMENTAL_ROUNDS} trees per week)")
+
+
+if __name__ == "__main__":
+    main()
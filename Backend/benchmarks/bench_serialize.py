@@ -0,0 +1,121 @@
+# bench_serialize.py
+#
+# JSON response building: the old DataFrame -> replace -> to_dict -> jsonify path vs. scripts/serialize.py,
+# on synthetic cleaned_data-shaped rows as psycopg2 returns them (no database needed):
+#   python -m benchmarks.bench_serialize --rows 10000 100000
+#
+# Peak memory is what tracemalloc sees allocated during one call, on top of the input rows.
+
+import json
+import time
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from flask import Flask, jsonify
+from scripts import serialize
+from scripts.update_database import CLEANED_FEATURES
+from benchmarks.bench_pipeline import MAX_STATION_DAYS
+
+COLUMNS = ["location"] + CLEANED_FEATURES
+NUMERIC_COLUMNS = [col for col in CLEANED_FEATURES if col != "date"]
+
+app = Flask(__name__)
+
+
+def synthetic_rows(rows, seed=42):
+    """Tuples in cleaned_data column order: location, date, then REAL columns with ~1% NULLs"""
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(2.0, 40.0, (rows, len(NUMERIC_COLUMNS))).round(2)
+    values[rng.random(values.shape) < 0.01] = np.nan
+    start = date(2000, 1, 1)
+    return [
+        (f"Station {i // MAX_STATION_DAYS}", start + timedelta(days=i % MAX_STATION_DAYS), *[None if v != v else v for v in row])
+        for i, row in enumerate(values.tolist())
+    ]
+
+
+def pandas_rows(rows):
+    # The previous view_data / get_forecast path
+    df = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    df.columns = df.columns.str.strip().str.lower()
+    df = df.replace({np.nan: None})
+    with app.app_context():
+        return jsonify(df.to_dict(orient='records')).get_data()
+
+
+def serialize_rows(rows):
+    columns = [(col.lower(), i) for i, col in enumerate(COLUMNS)]
+    return app.response_class(serialize.records_json(columns, rows), mimetype='application/json').get_data()
+
+
+def serialize_stream(rows, chunk_size=1000):
+    # What a streamed response sends, one STREAM_CHUNK_SIZE partition at a time
+    columns = [(col.lower(), i) for i, col in enumerate(COLUMNS)]
+    chunks = (rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size))
+    return sum(len(part) for part in serialize.iter_records_json(columns, chunks))
+
+
+def pandas_frame(df):
+    # The previous fetch_current_data path
+    with app.app_context():
+        return jsonify(df.to_dict(orient='records')).get_data()
+
+
+def serialize_frame(df):
+    return serialize.frame_records_json(df)
+
+
+def check_same_values(rows):
+    # Both paths must send the same values; only key order and the date format (HTTP date vs. ISO) differ
+    old, new = json.loads(pandas_rows(rows)), json.loads(serialize_rows(rows))
+    for old_record, new_record, row in zip(old, new, rows):
+        assert new_record.pop("date") == row[1].isoformat()
+        old_record.pop("date")
+        assert old_record == new_record, (old_record, new_record)
+    assert len(old) == len(new) == len(rows)
+
+
+def measure(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'input':>6} {'method':>17} {'seconds':>8} {'per 100k':>9} {'peak MB':>8} {'speedup':>8}")
+    for rows in args.rows:
+        records = synthetic_rows(rows)
+        frame = pd.DataFrame.from_records(records, columns=COLUMNS)
+        frame["date"] = pd.to_datetime(frame["date"])
+
+        check_same_values(records[:1000])
+
+        for label, data, methods in (
+            ("rows", records, [pandas_rows, serialize_rows, serialize_stream]),
+            ("frame", frame, [pandas_frame, serialize_frame]),
+        ):
+            baseline = None
+            for method in methods:
+                seconds, peak = measure(method, data, args.repeat)
+                baseline = baseline or seconds
+                print(f"{rows:>8} {label:>6} {method.__name__:>17} {seconds:>8.3f} {seconds * 100_000 / rows:>9.3f} "
+                      f"{peak:>8.1f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
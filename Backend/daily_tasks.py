@@ -1,16 +1,29 @@
 # daily_tasks.py
 
-import datetime
-from scripts.train_model import train_model
+import os
+from datetime import datetime
+from scripts import metrics
+from scripts.train_model import train_model, incremental_train
 
+# 'full' refits the production config, 'incremental' continues boosting on the new rows (with a
+# scheduled or drift-triggered full refit), 'tune' runs the walk-forward search first (scripts/tuning.py)
+TRAIN_MODE = os.getenv("TRAIN_MODE", "full")
+
+@metrics.timed("daily_tasks")
 def run_daily_tasks():
     """
-    Function to run hourly tasks such as training the model.
+    Function to run daily tasks such as training the model.
     """
     # Train the model
-    train_model()
+    if TRAIN_MODE == 'tune':
+        from scripts.tuning import tune_model  # Only the tuning mode needs the process pool
+        tune_model()
+    elif TRAIN_MODE == 'incremental':
+        incremental_train()
+    else:
+        train_model()
     print("Model trained successfully!")
 
 if __name__ == "__main__":
     run_daily_tasks()
-    print("Hourly tasks completed at:", datetime.now())
+    print("Daily tasks completed at:", datetime.now())
@@ -0,0 +1,40 @@
+# gunicorn.conf.py
+#
+# Read by gunicorn at startup (see the Dockerfile CMD). Worker count comes from WEB_CONCURRENCY.
+#
+# With PRELOAD_APP on, the master imports the app together with the ML modules and loads the
+# current model once before forking, so workers start without paying for xgboost/scikit-learn and
+# share the model's memory copy-on-write instead of each deserializing their own copy. A model
+# published later is still picked up by each worker on its own (model_registry checks current.json).
+
+import os
+import gc
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+preload_app = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the first fork
+    if not preload_app:
+        return
+
+    import daily_tasks  # noqa: F401  (train_model, xgboost, scikit-learn)
+    import hourly_tasks  # noqa: F401  (forecast, feature_store)
+    from scripts.db import dispose_engine
+    from scripts.model_registry import preload_model
+
+    try:
+        if not preload_model():
+            server.log.info("No published model yet; workers will load it on first use")
+    except Exception as e:
+        server.log.error(f"Model preload failed, workers will load it on first use: {e}")
+
+    # Workers must open their own connections, never inherit the master's sockets
+    dispose_engine()
+    # Keep everything loaded so far out of the workers' garbage collections, which would otherwise
+    # touch (and so copy) the shared pages
+    gc.freeze()
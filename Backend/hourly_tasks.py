@@ -1,14 +1,24 @@
 # hourly_tasks.py
 
 from datetime import datetime
+from scripts import metrics
 from scripts.forecast import get_aqi_forecast
-from scripts.fetch_data import fetch_data_from_apis
+from scripts.accuracy import score_forecasts
+from scripts.fetch_data import fetch_all_stations
+from scripts.feature_store import update_feature_store
 from scripts.update_database import update_database, append_aqi_forecast_to_db
 
+@metrics.timed("hourly_tasks")
 def run_hourly_tasks():
     # Fetch data from APIs and update the database`
-    weather_df, pollutant_df = fetch_data_from_apis()
-    update_database(weather_df, pollutant_df)
+    weather_df, pollutant_df = fetch_all_stations()
+    written_keys = update_database(weather_df, pollutant_df)
+
+    # Score earlier forecasts for the days that were just observed
+    score_forecasts(written_keys)
+
+    # Refresh the precomputed features for the days that just changed
+    update_feature_store(written_keys)
 
     # Get AQI forecast and append it to the database
     forecast = get_aqi_forecast()
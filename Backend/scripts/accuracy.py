@@ -0,0 +1,124 @@
+# accuracy.py
+
+import os
+from sqlalchemy import text
+from scripts.db import get_engine
+from scripts.stations import DEFAULT_LOCATION
+from scripts.update_database import BACKFILL_MODEL_PATTERN, ensure_schema
+
+# Horizons scored (days between forecast_date and predicted_date)
+MAX_HORIZON = 7
+
+# Default window of the rolling accuracy served by /api/forecast_accuracy, and the longest one allowed
+ACCURACY_WINDOW_DAYS = int(os.getenv("ACCURACY_WINDOW_DAYS", "30"))
+ACCURACY_MAX_DAYS = int(os.getenv("ACCURACY_MAX_DAYS", "3660"))
+
+
+def _date_ranges(keys):
+    # One (first, last) observed day per location, so a backfill scores as a single range scan
+    ranges = {}
+    for key in keys:
+        first, last = ranges.get(key["location"], (key["date"], key["date"]))
+        ranges[key["location"]] = (min(first, key["date"]), max(last, key["date"]))
+    return ranges
+
+
+def score_forecasts(keys):
+    """
+    Scores every stored forecast for the newly observed days against cleaned_data AQI, then
+    refreshes the per-day, per-horizon error sums for those days. keys is the list of
+    {"location", "date"} dicts returned by update_database. Re-observing a day (the hourly
+    running means change it) simply rescores it, so the aggregates stay exact. Backfilled
+    forecasts are in-sample for the model that made them and are not scored.
+    """
+    if not keys:
+        return 0
+
+    engine = get_engine()
+    ensure_schema(engine)
+
+    ranges = _date_ranges(keys)
+    scored = 0
+    with engine.begin() as conn:
+        for location, (since, until) in ranges.items():
+            params = {
+                "location": location, "since": since, "until": until, "max_horizon": MAX_HORIZON,
+                "backfill_pattern": BACKFILL_MODEL_PATTERN,
+            }
+            result = conn.execute(text("""
+                INSERT INTO forecast_errors (
+                    location, forecast_date, predicted_date, horizon, predicted_aqi, observed_aqi, error, scored_at
+                )
+                SELECT f.location, f.forecast_date, f.predicted_date,
+                       f.predicted_date::date - f.forecast_date::date,
+                       f.predicted_aqi, c."AQI", f.predicted_aqi - c."AQI", NOW()
+                FROM aqi_forecast f
+                JOIN cleaned_data c ON c.location = f.location AND c.date = f.predicted_date
+                WHERE f.location = :location
+                  AND f.predicted_date BETWEEN :since AND :until
+                  AND f.predicted_date::date - f.forecast_date::date BETWEEN 1 AND :max_horizon
+                  AND f.predicted_aqi IS NOT NULL
+                  AND f.model_name NOT LIKE :backfill_pattern
+                  AND c."AQI" IS NOT NULL
+                ON CONFLICT (location, predicted_date, forecast_date) DO UPDATE SET
+                    predicted_aqi = EXCLUDED.predicted_aqi,
+                    observed_aqi = EXCLUDED.observed_aqi,
+                    error = EXCLUDED.error,
+                    scored_at = EXCLUDED.scored_at
+            """), params)
+            scored += result.rowcount
+
+            conn.execute(text("""
+                INSERT INTO forecast_accuracy (location, predicted_date, horizon, n, abs_error_sum, sq_error_sum, updated_at)
+                SELECT location, predicted_date, horizon, COUNT(*), SUM(ABS(error)), SUM(error * error), NOW()
+                FROM forecast_errors
+                WHERE location = :location AND predicted_date BETWEEN :since AND :until
+                GROUP BY location, predicted_date, horizon
+                ON CONFLICT (location, predicted_date, horizon) DO UPDATE SET
+                    n = EXCLUDED.n,
+                    abs_error_sum = EXCLUDED.abs_error_sum,
+                    sq_error_sum = EXCLUDED.sq_error_sum,
+                    updated_at = EXCLUDED.updated_at
+            """), params)
+
+    print(f"Scored {scored} forecast(s) against observed AQI for {len(ranges)} location(s).")
+    return scored
+
+
+def get_forecast_accuracy(location=DEFAULT_LOCATION, days=ACCURACY_WINDOW_DAYS):
+    """
+    Rolling MAE/RMSE per horizon over the last `days` scored days for a location, read from
+    the forecast_accuracy sums (at most days x MAX_HORIZON rows)
+    """
+    engine = get_engine()
+    ensure_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            WITH latest AS (
+                SELECT MAX(predicted_date) AS last_day FROM forecast_accuracy WHERE location = :location
+            )
+            SELECT horizon,
+                   SUM(n) AS n,
+                   SUM(abs_error_sum) / SUM(n) AS mae,
+                   SQRT(SUM(sq_error_sum) / SUM(n)) AS rmse,
+                   MIN(predicted_date) AS first_day,
+                   MAX(predicted_date) AS last_day
+            FROM forecast_accuracy, latest
+            WHERE location = :location
+              AND predicted_date > latest.last_day - CAST(:days AS INTEGER)
+            GROUP BY horizon
+            ORDER BY horizon
+        """), {"location": location, "days": days}).mappings().all()
+
+    return [
+        {
+            "horizon": row["horizon"],
+            "n": int(row["n"]),
+            "mae": round(float(row["mae"]), 4),
+            "rmse": round(float(row["rmse"]), 4),
+            "first_day": row["first_day"].strftime('%Y-%m-%d'),
+            "last_day": row["last_day"].strftime('%Y-%m-%d'),
+        }
+        for row in rows
+    ]
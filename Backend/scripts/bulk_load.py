@@ -0,0 +1,209 @@
+# bulk_load.py
+
+import io
+import os
+import pandas as pd
+from sqlalchemy import text
+from scripts.db import get_engine
+from scripts.export import invalidate_export_cache
+from scripts.stations import DEFAULT_LOCATION
+from scripts.schema import CLEANED_FEATURES, DATA_TABLES, _quote, add_data_table_keys, column_type, ensure_schema
+
+# Rows read from each CSV and sent per COPY; one chunk is the unit of progress for resuming
+BULK_LOAD_CHUNK_ROWS = int(os.getenv("BULK_LOAD_CHUNK_ROWS", "100000"))
+
+
+def _column_type(name, dtype):
+    # Known columns get the schema's types, so a chunk that happens to be all-empty never picks the wrong one
+    if column_type(name):
+        return column_type(name)
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP"
+    return "TEXT"
+
+
+def _progress(conn, stage):
+    return conn.execute(
+        text("SELECT * FROM bulk_load_progress WHERE table_name = :stage"), {"stage": stage}
+    ).mappings().first()
+
+
+def _set_progress(conn, stage, source, rows_loaded, completed=False):
+    stat = os.stat(source)
+    conn.execute(text("""
+        INSERT INTO bulk_load_progress (table_name, source, source_size, source_mtime, rows_loaded, completed, updated_at)
+        VALUES (:stage, :source, :size, :mtime, :rows_loaded, :completed, NOW())
+        ON CONFLICT (table_name) DO UPDATE SET
+            source = EXCLUDED.source,
+            source_size = EXCLUDED.source_size,
+            source_mtime = EXCLUDED.source_mtime,
+            rows_loaded = EXCLUDED.rows_loaded,
+            completed = EXCLUDED.completed,
+            updated_at = EXCLUDED.updated_at
+    """), {
+        "stage": stage,
+        "source": source,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "rows_loaded": rows_loaded,
+        "completed": completed,
+    })
+
+
+def _resumable(progress, source):
+    """A recorded import can be continued only if it was reading this exact, unchanged file"""
+    if progress is None or progress["source"] != source:
+        return False
+    stat = os.stat(source)
+    return progress["source_size"] == stat.st_size and progress["source_mtime"] == stat.st_mtime_ns
+
+
+def _read_chunks(csv_path, skip_rows, location):
+    # skiprows keeps the header line (row 0) and skips the data rows already committed
+    chunks = pd.read_csv(
+        csv_path,
+        chunksize=BULK_LOAD_CHUNK_ROWS,
+        skiprows=range(1, skip_rows + 1) if skip_rows else None,
+    )
+    for chunk in chunks:
+        chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce')
+        if 'location' not in chunk.columns:
+            chunk.insert(0, 'location', location)
+        yield chunk
+
+
+def _copy_chunk(conn, table, chunk):
+    """Streams one chunk into table with COPY FROM STDIN (CSV, empty field = NULL)"""
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d')
+    buffer.seek(0)
+
+    columns = ", ".join(_quote(col) for col in chunk.columns)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer)
+    finally:
+        cursor.close()
+
+
+def _load_table(engine, table, csv_path, location):
+    """Copies one CSV into table chunk by chunk, committing each chunk together with its progress row"""
+    with engine.begin() as conn:
+        progress = _progress(conn, table)
+    if progress is not None and progress["completed"] and _resumable(progress, csv_path):
+        print(f"{table}: already loaded from {csv_path} ({progress['rows_loaded']} rows). Skipping.")
+        return progress["rows_loaded"]
+
+    rows_loaded = progress["rows_loaded"] if _resumable(progress, csv_path) else 0
+    if rows_loaded:
+        print(f"{table}: resuming {csv_path} after {rows_loaded} rows.")
+
+    created = rows_loaded > 0
+    for chunk in _read_chunks(csv_path, rows_loaded, location):
+        with engine.begin() as conn:
+            if not created:
+                # Fresh import: replace the table, without indexes until every row is in
+                columns = [f"{_quote(col)} {_column_type(col, dtype)}" for col, dtype in chunk.dtypes.items()]
+                conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+                conn.execute(text(f"CREATE TABLE {table} ({', '.join(columns)})"))
+                created = True
+            _copy_chunk(conn, table, chunk)
+            rows_loaded += len(chunk)
+            _set_progress(conn, table, csv_path, rows_loaded)
+        print(f"{table}: {rows_loaded} rows copied.")
+
+    with engine.begin() as conn:
+        _set_progress(conn, table, csv_path, rows_loaded, completed=True)
+    return rows_loaded
+
+
+def _drop_duplicates(conn, table):
+    # Duplicate days in a CSV would block the unique key (and multiply in the join); keep the first copy
+    removed = conn.execute(text(f"""
+        DELETE FROM {table} a USING {table} b
+        WHERE a.ctid > b.ctid AND a.location = b.location AND a.date = b.date
+    """)).rowcount
+    if removed:
+        print(f"{table}: removed {removed} duplicate (location, date) row(s).")
+
+
+def _derive_merged_tables(engine):
+    """Builds raw_data (weather joined with pollutant per location and date) and cleaned_data inside Postgres"""
+    with engine.begin() as conn:
+        _drop_duplicates(conn, 'weather_data')
+        _drop_duplicates(conn, 'pollutant_data')
+        columns = {
+            table: [row[0] for row in conn.execute(text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = :table ORDER BY ordinal_position"
+            ), {"table": table})]
+            for table in ('weather_data', 'pollutant_data')
+        }
+        pollutant_only = [col for col in columns['pollutant_data'] if col not in columns['weather_data']]
+        raw_select = [f"w.{_quote(col)}" for col in columns['weather_data']] + [f"p.{_quote(col)}" for col in pollutant_only]
+        cleaned_select = [_quote(col) for col in ['location'] + CLEANED_FEATURES
+                          if col in columns['weather_data'] + pollutant_only]
+
+        conn.execute(text("DROP TABLE IF EXISTS raw_data CASCADE"))
+        conn.execute(text(f"""
+            CREATE TABLE raw_data AS
+            SELECT {", ".join(raw_select)}
+            FROM weather_data w
+            JOIN pollutant_data p ON p.location = w.location AND p.date = w.date
+            ORDER BY w.location, w.date
+        """))
+        conn.execute(text("DROP TABLE IF EXISTS cleaned_data CASCADE"))
+        conn.execute(text(f"CREATE TABLE cleaned_data AS SELECT {', '.join(cleaned_select)} FROM raw_data"))
+        rows = conn.execute(text("SELECT COUNT(*) FROM raw_data")).scalar()
+    print(f"raw_data and cleaned_data built from the join: {rows} rows.")
+
+
+def _create_indexes(engine):
+    """The schema's primary keys and date indexes, built once over the loaded data instead of maintained per row"""
+    with engine.begin() as conn:
+        for table in DATA_TABLES:
+            add_data_table_keys(conn, table)
+            conn.execute(text(f"ANALYZE {table}"))
+
+
+def bulk_load_csv(weather_csv_path, pollutant_csv_path, location=DEFAULT_LOCATION, resume=True, rebuild_features=True):
+    """
+    Imports the weather and pollutant CSVs into Postgres without holding either file in memory:
+    each is streamed in BULK_LOAD_CHUNK_ROWS chunks through COPY FROM STDIN, raw_data and
+    cleaned_data are derived with one join in SQL, and indexes are created at the end.
+
+    Progress is committed with every chunk in bulk_load_progress, so rerunning after a failure
+    continues from the last committed chunk, as long as the CSV is unchanged. resume=False
+    starts over. Rows without a 'location' column are assigned to `location`.
+
+    The feature store is then rebuilt from the imported history (rebuild_features=False skips it),
+    since the hourly job only ever recomputes the days it ingests.
+    """
+    engine = get_engine()
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        if not resume:
+            conn.execute(text("DELETE FROM bulk_load_progress"))
+
+    counts = {
+        'weather_data': _load_table(engine, 'weather_data', weather_csv_path, location),
+        'pollutant_data': _load_table(engine, 'pollutant_data', pollutant_csv_path, location),
+    }
+    _derive_merged_tables(engine)
+    _create_indexes(engine)
+    for table in DATA_TABLES:
+        invalidate_export_cache(table)
+    if rebuild_features:
+        # Local import: feature_store pulls in train_model and its ML dependencies
+        from scripts.feature_store import rebuild_feature_store
+        rebuild_feature_store()
+
+    # The next import of the same files starts from scratch
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM bulk_load_progress"))
+    print(f"Bulk load finished: {counts['weather_data']} weather and {counts['pollutant_data']} pollutant rows.")
+    return counts
@@ -0,0 +1,133 @@
+# db.py
+
+import os
+import zlib
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.pool import QueuePool
+from scripts import metrics
+
+load_dotenv()
+
+# Pool settings, tunable per deployment (Render instances allow only a handful of Postgres connections)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+_engine = None
+_engine_lock = threading.Lock()
+_stats_lock = threading.Lock()
+
+_pool_stats = {
+    "connects": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "timeouts": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with _stats_lock:
+                _pool_stats["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with _stats_lock:
+                _pool_stats["total_wait_seconds"] += waited
+                _pool_stats["max_wait_seconds"] = max(_pool_stats["max_wait_seconds"], waited)
+
+
+def _count(name):
+    def listener(*args):
+        with _stats_lock:
+            _pool_stats[name] += 1
+    return listener
+
+
+def get_engine():
+    """Returns the process-wide SQLAlchemy engine, creating it (and its pool) on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(
+                    os.getenv("DATABASE_URL"),
+                    poolclass=TimedQueuePool,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                )
+                event.listen(engine, "connect", _count("connects"))
+                event.listen(engine, "checkout", _count("checkouts"))
+                event.listen(engine, "checkin", _count("checkins"))
+                metrics.instrument_engine(engine)
+                _engine = engine
+    return _engine
+
+
+def dispose_engine():
+    """Closes all pooled connections, e.g. after forking so children never share sockets"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Postgres session-level advisory lock shared by every process using the database.
+    Yields True when acquired and False when another session already holds it.
+    """
+    engine = get_engine()
+    if engine.dialect.name != 'postgresql':
+        yield True
+        return
+
+    key = zlib.crc32(name.encode())
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                conn.commit()
+
+
+def get_pool_stats():
+    """Returns checkout/wait counters and the current pool occupancy"""
+    with _stats_lock:
+        stats = dict(_pool_stats)
+
+    stats["total_wait_seconds"] = round(stats["total_wait_seconds"], 6)
+    stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 6)
+    stats["avg_wait_seconds"] = round(stats["total_wait_seconds"] / stats["checkouts"], 6) if stats["checkouts"] else 0.0
+    stats["pool_size"] = DB_POOL_SIZE
+    stats["max_overflow"] = DB_MAX_OVERFLOW
+
+    engine = _engine
+    if engine is not None:
+        pool = engine.pool
+        stats["checked_out"] = pool.checkedout()
+        stats["checked_in"] = pool.checkedin()
+        stats["overflow"] = pool.overflow()
+    return stats
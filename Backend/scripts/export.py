@@ -0,0 +1,164 @@
+# export.py
+
+import os
+import glob
+import tempfile
+import threading
+import calendar
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import date, datetime
+from sqlalchemy import text
+from scripts.db import get_engine
+
+# Where exports of whole past months are kept. Files are named after the table's data version, which
+# writers bump (invalidate_export_cache) when they change an already-ended month
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "aqi_exports"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "50000"))
+
+EXPORT_FORMATS = {
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+
+
+def cacheable_month(start_date, end_date):
+    """Returns 'YYYY-MM' when the range is exactly one calendar month that has already ended"""
+    try:
+        start = datetime.strptime(start_date or '', '%Y-%m-%d').date()
+        end = datetime.strptime(end_date or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+    last_day = calendar.monthrange(start.year, start.month)[1]
+    today = date.today()
+    if start.day != 1 or end != start.replace(day=last_day) or (end.year, end.month) >= (today.year, today.month):
+        return None
+    return start.strftime('%Y-%m')
+
+
+# Arrow type of each information_schema.columns.data_type; anything else is exported as text
+ARROW_TYPES = {
+    'date': pa.date32(),
+    'timestamp without time zone': pa.timestamp('us'),
+    'timestamp with time zone': pa.timestamp('us', tz='UTC'),
+    'real': pa.float32(),
+    'double precision': pa.float64(),
+    'numeric': pa.float64(),
+    'smallint': pa.int16(),
+    'integer': pa.int32(),
+    'bigint': pa.int64(),
+    'boolean': pa.bool_(),
+}
+
+
+def _arrow_schema(conn, table_name, column_order):
+    """
+    Schema from the table's declared column types, so it never depends on which values happen
+    to be in the first chunk (a REAL column that is NULL there is still float32)
+    """
+    declared = {
+        name.strip().lower(): data_type
+        for name, data_type in conn.execute(text("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = :table
+        """), {"table": table_name})
+    }
+    return pa.schema([
+        pa.field(col, ARROW_TYPES.get(declared[col], pa.string())) for col in column_order if col in declared
+    ])
+
+
+def write_export(table_name, query, params, column_order, output_format, path):
+    """
+    Streams the query result from a server-side cursor in EXPORT_CHUNK_SIZE chunks into a
+    Parquet or Arrow IPC file, keeping only the columns in column_order (in that order).
+    Returns the number of rows written.
+    """
+    writer, rows = None, 0
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    try:
+        with get_engine().connect() as conn:
+            schema = _arrow_schema(conn, table_name, column_order)
+            if output_format == 'parquet':
+                writer = pq.ParquetWriter(tmp_path, schema, compression='zstd')
+            else:
+                writer = pa.ipc.new_file(tmp_path, schema)
+
+            result = conn.execution_options(stream_results=True, max_row_buffer=EXPORT_CHUNK_SIZE).execute(
+                text(query), params
+            )
+            positions = {key.strip().lower(): i for i, key in enumerate(result.keys())}
+            # Column arrays straight from the DB rows, converted to the declared types (NaN as null)
+            for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+                columns = list(zip(*chunk))
+                arrays = [pa.array(columns[positions[field.name]], type=field.type, from_pandas=True) for field in schema]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                rows += len(chunk)
+
+        writer.close()
+        writer = None
+        os.replace(tmp_path, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return rows
+
+
+def _version_path(table_name):
+    return os.path.join(EXPORT_CACHE_DIR, f"{table_name}.version")
+
+
+def _data_version(table_name):
+    try:
+        return os.stat(_version_path(table_name)).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def invalidate_export_cache(table_name, dates=None):
+    """
+    Drops the cached month files of a table after a write. With dates (the rows' dates), only a
+    write that reaches into an already-ended month does so; today's hourly rows leave the cache alone.
+    An export still running under the old version writes a file nobody will look up again.
+    """
+    if dates is not None:
+        first_of_month = date.today().replace(day=1)
+        if not any(pd.Timestamp(day).date() < first_of_month for day in dates):
+            return
+
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    with open(_version_path(table_name), "w") as f:
+        f.write(str(datetime.now()))
+    version = _data_version(table_name)
+    for path in glob.glob(os.path.join(EXPORT_CACHE_DIR, f"{table_name}_????-??_v*.*")):
+        if not path.endswith(".tmp") and f"_v{version}." not in os.path.basename(path):
+            os.remove(path)
+
+
+def export_table(table_name, query, params, column_order, output_format, start_date=None, end_date=None):
+    """
+    Returns (path, is_temporary) for a columnar export. Whole past months are served from
+    EXPORT_CACHE_DIR once written (until the table's data version changes); any other range
+    goes to a temporary file the caller removes.
+    """
+    extension, _ = EXPORT_FORMATS[output_format]
+    month = cacheable_month(start_date, end_date)
+
+    if month:
+        os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+        path = os.path.join(EXPORT_CACHE_DIR, f"{table_name}_{month}_v{_data_version(table_name)}.{extension}")
+        if not os.path.exists(path):
+            rows = write_export(table_name, query, params, column_order, output_format, path)
+            print(f"Cached {rows} rows of {table_name} for {month} at {path}")
+        return path, False
+
+    fd, path = tempfile.mkstemp(suffix=f".{extension}")
+    os.close(fd)
+    write_export(table_name, query, params, column_order, output_format, path)
+    return path, True
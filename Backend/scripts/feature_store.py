@@ -0,0 +1,134 @@
+# feature_store.py
+
+import json
+import pandas as pd
+from sqlalchemy import text
+from scripts.db import get_engine
+from scripts.stations import DEFAULT_LOCATION
+from scripts.update_database import ensure_schema
+from scripts.features import build_feature_matrix
+from scripts.train_model import load_data
+
+# Rows of history a feature row depends on (7-day rolling sums and lags 1..7)
+FEATURE_LOOKBACK_ROWS = 7
+
+# Tail of history loaded when a feature vector has to be computed on the fly
+FORECAST_WINDOW_ROWS = 14
+
+
+def _feature_rows(data):
+    """Engineered + lag features, one JSON object per date, in the column order the model was trained on"""
+    features = build_feature_matrix(data)
+    feature_columns = [col for col in features.columns if col != 'AQI']
+    feature_idx = [features.columns.index(col) for col in feature_columns]
+
+    dates = pd.DatetimeIndex(features.dates).strftime('%Y-%m-%d')
+    return [
+        {"date": day, "features": json.dumps(dict(zip(feature_columns, row.tolist())))}
+        for day, row in zip(dates, features.values[:, feature_idx])
+    ]
+
+
+def _upsert_features(conn, location, rows):
+    if not rows:
+        return
+    conn.execute(text("""
+        INSERT INTO feature_store (location, date, features, updated_at)
+        VALUES (:location, :date, :features, NOW())
+        ON CONFLICT (location, date) DO UPDATE SET
+            features = EXCLUDED.features,
+            updated_at = EXCLUDED.updated_at
+    """), [{"location": location, **row} for row in rows])
+
+
+def load_window(location, since, until=None):
+    """Rows from `since` (through `until`) plus the FEATURE_LOOKBACK_ROWS rows before it that their features depend on"""
+    lookback = load_data(location, until=since, last_n_days=FEATURE_LOOKBACK_ROWS + 1, downcast=True)
+    newer = load_data(location, since=since, until=until, downcast=True)
+    return pd.concat([lookback, newer], ignore_index=True).drop_duplicates(subset='date')
+
+
+def update_feature_store(keys):
+    """
+    Recomputes feature rows only for the window touched by new data: for each location, the
+    earliest changed date onwards plus FEATURE_LOOKBACK_ROWS rows before it. keys is the list
+    of {"location", "date"} dicts returned by update_database.
+    """
+    engine = get_engine()
+    ensure_schema(engine)
+
+    earliest = {}
+    for key in keys:
+        earliest[key["location"]] = min(earliest.get(key["location"], key["date"]), key["date"])
+
+    updates = {}
+    for location, since in earliest.items():
+        # The earliest changed day with the rows its rolling sums and lags look back on, then any later days
+        window = load_window(location, since)
+        updates[location] = [row for row in _feature_rows(window) if row["date"] >= since]
+
+    with engine.begin() as conn:
+        for location, rows in updates.items():
+            _upsert_features(conn, location, rows)
+            print(f"Feature store updated for {location}: {len(rows)} row(s) since {earliest[location]}.")
+
+
+def compute_latest_features(location=DEFAULT_LOCATION):
+    """
+    Builds the newest feature vector from just the last FORECAST_WINDOW_ROWS days,
+    stores it and returns it as a one-row DataFrame (None if there is not enough history)
+    """
+    rows = _feature_rows(load_data(location, last_n_days=FORECAST_WINDOW_ROWS, downcast=True))[-1:]
+    if not rows:
+        return None
+
+    with get_engine().begin() as conn:
+        _upsert_features(conn, location, rows)
+    return pd.DataFrame([json.loads(rows[0]["features"])], index=[rows[0]["date"]])
+
+
+def rebuild_feature_store(locations=None):
+    """
+    Recomputes the feature rows of each location from its full history, replacing what the store
+    held for it. By default every station in cleaned_data, dropping rows of stations no longer
+    there; bulk_load_csv runs it after an import, so a fresh database starts with a full store.
+    """
+    engine = get_engine()
+    ensure_schema(engine)
+
+    rebuild_all = locations is None
+    if rebuild_all:
+        with engine.connect() as conn:
+            locations = [row[0] for row in conn.execute(text("SELECT DISTINCT location FROM cleaned_data ORDER BY location"))]
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM feature_store WHERE location <> ALL(:locations)"), {"locations": locations})
+
+    for location in locations:
+        # Same float32 inputs as update_feature_store and compute_latest_features
+        rows = _feature_rows(load_data(location, downcast=True))
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM feature_store WHERE location = :location"), {"location": location})
+            _upsert_features(conn, location, rows)
+        print(f"Feature store rebuilt for {location}: {len(rows)} row(s).")
+
+
+def get_latest_features(location=DEFAULT_LOCATION):
+    """Returns the newest precomputed feature vector for a location as a one-row DataFrame, or None"""
+    engine = get_engine()
+    ensure_schema(engine)
+
+    with engine.connect() as conn:
+        row = conn.execute(text("""
+            SELECT date, features FROM feature_store
+            WHERE location = :location
+            ORDER BY date DESC
+            LIMIT 1
+        """), {"location": location}).first()
+
+    if row is None:
+        return None
+    return pd.DataFrame([json.loads(row.features)], index=[row.date])
+
+
+if __name__ == '__main__':
+    rebuild_feature_store()
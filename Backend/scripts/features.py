@@ -0,0 +1,87 @@
+# features.py
+
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from numpy.lib.stride_tricks import sliding_window_view
+from scripts import metrics
+
+# values: contiguous 2-D array, columns: names for its columns, dates: date of each row
+FeatureMatrix = namedtuple("FeatureMatrix", ["values", "columns", "dates"])
+
+ENGINEERED_COLUMNS = [
+    'total_pollution', 'aqi_cum_sum_7', 'month', 'is_summer', 'is_winter', 'pm25_co_interaction',
+    'temp_humidity_interaction', 'pm25_cumulative_sum_7', 'pm25_no2_interaction', 'pm25_so2_interaction'
+]
+
+
+def _rolling_sum(values, window):
+    # NaN until a full window is available, and whenever the window contains a NaN (like Series.rolling().sum())
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = sliding_window_view(values, window).sum(axis=1)
+    return out
+
+
+@metrics.timed("feature_engineering")
+def build_feature_matrix(df, num_lags=7, dtype=np.float32):
+    """
+    Vectorized equivalent of engineer_additional_features followed by create_lag_features.
+
+    Every feature is written into one preallocated array instead of being inserted into the
+    DataFrame column by column; rows with any missing value are dropped at the end, as dropna() did.
+    The input frame is left untouched. Column order matches the pandas path with 'date' removed.
+    """
+    dates = None
+    if 'date' in df.columns:
+        dates = df['date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates, errors='coerce')
+    base_columns = [col for col in df.columns if col != 'date']
+    base = df[base_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    column = {name: base[:, i] for i, name in enumerate(base_columns)}
+
+    columns = base_columns + ENGINEERED_COLUMNS + [f'lag_{i}_AQI' for i in range(1, num_lags + 1)]
+    out = np.empty((len(df), len(columns)), dtype=np.float64)
+    out[:, :len(base_columns)] = base
+
+    if dates is not None:
+        dates = dates.to_numpy()
+        month = pd.DatetimeIndex(dates).month.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        month = column['month']
+
+    aqi = column['AQI']
+    pm25 = column['pm25']
+    j = len(base_columns)
+    out[:, j] = np.nansum(base[:, [base_columns.index(col) for col in ['pm25', 'pm10', 'no2', 'so2', 'co', 'o3']]], axis=1)
+    out[:, j + 1] = _rolling_sum(aqi, 7)
+    out[:, j + 2] = month
+    out[:, j + 3] = np.isin(month, [6, 7, 8])
+    out[:, j + 4] = np.isin(month, [12, 1, 2])
+    out[:, j + 5] = pm25 * column['co']
+    out[:, j + 6] = column['temp'] * column['humidity']
+    out[:, j + 7] = _rolling_sum(pm25, 7)
+    out[:, j + 8] = pm25 * column['no2']
+    out[:, j + 9] = pm25 * column['so2']
+
+    # Lag i is AQI shifted down by i rows; the first i rows have no history
+    j += len(ENGINEERED_COLUMNS)
+    for i in range(1, num_lags + 1):
+        out[:i, j + i - 1] = np.nan
+        out[i:, j + i - 1] = aqi[:-i]
+
+    keep = ~np.isnan(out).any(axis=1)
+    if dates is not None:
+        keep &= ~np.isnat(dates)
+
+    values = np.ascontiguousarray(out[keep], dtype=dtype)
+    row_dates = dates[keep] if dates is not None else None
+    return FeatureMatrix(values, columns, row_dates)
+
+
+def build_targets(aqi, horizon=7):
+    """AQI for each of the next `horizon` rows; rows without a full horizon ahead are cut off"""
+    if len(aqi) <= horizon:
+        return np.empty((0, horizon), dtype=aqi.dtype)
+    return np.ascontiguousarray(sliding_window_view(aqi, horizon + 1)[:, 1:])
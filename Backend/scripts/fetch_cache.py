@@ -0,0 +1,136 @@
+# fetch_cache.py
+
+import os
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from scripts import metrics
+from scripts.fetch_data import _today, fetch_data_from_apis, get_upstream_calls
+from scripts.stations import DEFAULT_LOCATION
+
+# Live data for the dashboard, cached per (location, from_date, day) so refreshing clients share
+# upstream calls. Fresh for FETCH_CACHE_TTL seconds; for FETCH_CACHE_STALE_SECONDS after that it is
+# still served at once while one background fetch replaces it.
+FETCH_CACHE_TTL = float(os.getenv("FETCH_CACHE_TTL", "300"))
+FETCH_CACHE_STALE_SECONDS = float(os.getenv("FETCH_CACHE_STALE_SECONDS", "3600"))
+FETCH_CACHE_MAX_ENTRIES = int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "256"))
+
+# Upstream calls (weather + pollutant) this process may make per IST day, 0 for no limit. Once it is
+# reached only cached data is served, however old; the hourly ingest counts towards it but is never blocked.
+UPSTREAM_DAILY_QUOTA = int(os.getenv("UPSTREAM_DAILY_QUOTA", "0"))
+CALLS_PER_FETCH = 2
+
+CacheEntry = namedtuple("CacheEntry", ["value", "fetched_at"])
+
+
+class UpstreamQuotaExceeded(RuntimeError):
+    pass
+
+
+_lock = threading.Lock()
+_entries = {}
+_inflight = {}
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fetch-cache")
+_stats = {"fresh": 0, "stale": 0, "misses": 0, "coalesced": 0, "refresh_errors": 0, "quota_rejections": 0}
+
+
+def _count(outcome):
+    _stats[outcome] += 1
+    metrics.inc("aqi_fetch_cache_requests_total", result=outcome)
+
+
+def _quota_left():
+    if UPSTREAM_DAILY_QUOTA <= 0:
+        return True
+    return sum(get_upstream_calls().values()) + CALLS_PER_FETCH <= UPSTREAM_DAILY_QUOTA
+
+
+def _store(key, value):
+    # Called with _lock held; days other than today can never be asked for again
+    for old_key in [old_key for old_key in _entries if old_key[2] != key[2]]:
+        del _entries[old_key]
+    _entries[key] = CacheEntry(value, time.monotonic())
+    while len(_entries) > FETCH_CACHE_MAX_ENTRIES:
+        oldest = min(_entries, key=lambda k: _entries[k].fetched_at)
+        del _entries[oldest]
+
+
+def _fetch(key, future, background=False):
+    """Runs the one upstream fetch for a key and hands its result to every waiter"""
+    location, from_date, _ = key
+    try:
+        value = fetch_data_from_apis(from_date=from_date, location=location)
+    except Exception as e:
+        with _lock:
+            _inflight.pop(key, None)
+        if background:
+            # The stale entry stays and the refresh is retried on a later request
+            _stats["refresh_errors"] += 1
+            print(f"Background refresh of current data for {location} failed: {e}")
+        future.set_exception(e)
+        return
+    with _lock:
+        _store(key, value)
+        _inflight.pop(key, None)
+    future.set_result(value)
+
+
+def _refresh_in_background(key):
+    # Called with _lock held
+    future = _inflight[key] = Future()
+    _refresher.submit(_fetch, key, future, True)
+
+
+def get_current_data(from_date=None, location=DEFAULT_LOCATION):
+    """
+    fetch_data_from_apis through the cache: (weather_df, pollutant_df) for a station. Concurrent
+    requests for the same key wait on a single upstream fetch. The frames are shared between
+    requests, so callers must not modify them.
+    """
+    today = _today()
+    key = (location, from_date or today, today)
+    leader = False
+
+    with _lock:
+        entry = _entries.get(key)
+        age = time.monotonic() - entry.fetched_at if entry is not None else None
+        if entry is not None and age < FETCH_CACHE_TTL:
+            _count("fresh")
+            return entry.value
+
+        future = _inflight.get(key)
+        if entry is not None and (age < FETCH_CACHE_TTL + FETCH_CACHE_STALE_SECONDS or not _quota_left()):
+            _count("stale")
+            if future is None and _quota_left():
+                _refresh_in_background(key)
+            return entry.value
+
+        if future is not None:
+            _count("coalesced")
+        elif not _quota_left():
+            _count("quota_rejections")
+            raise UpstreamQuotaExceeded(
+                f"Daily upstream quota of {UPSTREAM_DAILY_QUOTA} calls reached and no cached data for {location}."
+            )
+        else:
+            _count("misses")
+            future = _inflight[key] = Future()
+            leader = True
+
+    # The first caller fetches in its own thread; the others wait for its result
+    if leader:
+        _fetch(key, future)
+    return future.result()
+
+
+def get_cache_stats():
+    return {
+        "entries": len(_entries),
+        "in_flight": len(_inflight),
+        "ttl_seconds": FETCH_CACHE_TTL,
+        "stale_seconds": FETCH_CACHE_STALE_SECONDS,
+        "upstream_calls_today": get_upstream_calls(),
+        "upstream_daily_quota": UPSTREAM_DAILY_QUOTA or None,
+        **_stats,
+    }
@@ -1,31 +1,198 @@
 # fetch_data.py
 
 import os
+import threading
 import requests
 import pandas as pd
+from urllib.parse import quote, urlsplit
 from zoneinfo import ZoneInfo # for timezone handling
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from scripts import metrics
+from scripts.stations import DEFAULT_LOCATION, get_station, load_stations
 
 load_dotenv()
 
-def fetch_data_from_apis(from_date=None):
-    WEATHER_API_KEY = os.getenv("WEATHER_KEY")
-    POLLUTANT_API_KEY = os.getenv("POLLUTANT_KEY")
-    STATION = "@10124"
-    LOCATION = "INDIRA GANDHI INTERNATIONAL, IN"
+# Upstream endpoints (overridable so the fetch layer can be pointed at a local stub server)
+WEATHER_API_BASE = os.getenv(
+    "WEATHER_API_BASE", "https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline"
+)
+POLLUTANT_API_BASE = os.getenv("POLLUTANT_API_BASE", "https://api.waqi.info/feed")
 
-    today = datetime.now(ZoneInfo("Asia/Kolkata")).strftime('%Y-%m-%d') # Current date in IST timezone
+# Per-call timeout (connect, read) in seconds and retry policy for transient upstream failures
+FETCH_TIMEOUT = (float(os.getenv("FETCH_CONNECT_TIMEOUT", "5")), float(os.getenv("FETCH_READ_TIMEOUT", "20")))
+FETCH_MAX_RETRIES = int(os.getenv("FETCH_MAX_RETRIES", "3"))
+FETCH_BACKOFF_FACTOR = float(os.getenv("FETCH_BACKOFF_FACTOR", "0.5"))
+
+# Upper bound on upstream calls in flight at once (shared by single and batch fetches)
+FETCH_MAX_CONCURRENCY = int(os.getenv("FETCH_MAX_CONCURRENCY", "8"))
+
+# Keep-alive session and worker threads shared across runs in this process
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=FETCH_MAX_CONCURRENCY, thread_name_prefix="fetch")
+
+# Upstream calls made by this process per (api, IST day), the basis of the quota in fetch_cache.py
+_calls_lock = threading.Lock()
+_upstream_calls = {}
+
+
+class UpstreamError(RuntimeError):
+    """A failed upstream call. The message names only the host: the full URL carries the API key."""
+
+
+def build_transport():
+    """Default transport: pooled connections with bounded retries and exponential backoff"""
+    retry = Retry(
+        total=FETCH_MAX_RETRIES,
+        backoff_factor=FETCH_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+    )
+    return HTTPAdapter(pool_connections=4, pool_maxsize=FETCH_MAX_CONCURRENCY, max_retries=retry)
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session(build_transport())
+    return _session
+
+
+def set_transport(transport):
+    """
+    Replaces the transport used for all upstream calls, e.g. with a custom
+    requests adapter that talks to a local stub server in tests.
+    """
+    global _session
+    with _session_lock:
+        old_session, _session = _session, _create_session(transport)
+    if old_session is not None:
+        old_session.close()
+
+
+def _create_session(transport):
+    session = requests.Session()
+    session.mount("http://", transport)
+    session.mount("https://", transport)
+    return session
+
+
+def _today():
+    return datetime.now(ZoneInfo("Asia/Kolkata")).strftime('%Y-%m-%d') # Current date in IST timezone
+
+
+def _count_call(api):
+    day = _today()
+    with _calls_lock:
+        for key in [key for key in _upstream_calls if key[1] != day]:
+            del _upstream_calls[key]
+        _upstream_calls[(api, day)] = _upstream_calls.get((api, day), 0) + 1
+    metrics.inc("aqi_upstream_calls_total", api=api)
+
+
+def get_upstream_calls():
+    """Upstream calls made today by this process, per API (retries inside the transport count once)"""
+    day = _today()
+    with _calls_lock:
+        return {api: count for (api, call_day), count in _upstream_calls.items() if call_day == day}
+
+
+def _get_json(api, url, params):
+    _count_call(api)
+    host = urlsplit(url).netloc
+    # requests' own errors (HTTPError, RetryError, ConnectionError) quote the URL with its query string
+    try:
+        response = get_session().get(url, params=params, timeout=FETCH_TIMEOUT)
+    except requests.RequestException as e:
+        raise UpstreamError(f"{api} request to {host} failed: {type(e).__name__}") from None
+    if not response.ok:
+        raise UpstreamError(f"{response.status_code} from {host}")
+    return response.json()
+
+
+@metrics.timed("fetch_weather")
+def fetch_weather(location, from_date, to_date):
+    weather_url = f"{WEATHER_API_BASE}/{quote(location)}/{from_date}/{to_date}"
+    params = {
+        "unitGroup": "metric",
+        "include": "days",
+        "key": os.getenv("WEATHER_KEY"),
+        "contentType": "json",
+    }
+    return _get_json("weather", weather_url, params)
+
+
+@metrics.timed("fetch_pollutant")
+def fetch_pollutant(station):
+    pollutant_url = f"{POLLUTANT_API_BASE}/{station}/"
+    return _get_json("pollutant", pollutant_url, {"token": os.getenv("POLLUTANT_KEY")})
+
+
+def _submit_station(station, from_date, to_date):
+    # Issue both API calls concurrently so the wall time is the slower of the two, not their sum
+    weather_future = _executor.submit(fetch_weather, station["weather_location"], from_date, to_date)
+    pollutant_future = _executor.submit(fetch_pollutant, station["station"])
+    return weather_future, pollutant_future
+
+
+def _collect_station(station, futures, today):
+    weather_future, pollutant_future = futures
+    weather_df = parse_weather_response(weather_future.result())
+    pollutant_df = parse_pollutant_response(pollutant_future.result(), today)
+    weather_df["location"] = station["location"]
+    pollutant_df["location"] = station["location"]
+    return weather_df, pollutant_df
+
+
+def fetch_data_from_apis(from_date=None, location=DEFAULT_LOCATION):
+    station = get_station(location)
+
+    today = _today()
     from_date = from_date or today
     to_date = today
 
-    # Weather API call
-    weather_url = (
-        f"https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/"
-        f"{LOCATION}/{from_date}/{to_date}?unitGroup=metric&include=days&key={WEATHER_API_KEY}&contentType=json"
-    )
-    weather_response = requests.get(weather_url).json()
+    futures = _submit_station(station, from_date, to_date)
+    return _collect_station(station, futures, today)
+
 
+def fetch_all_stations(stations=None, from_date=None):
+    """
+    Fetches every registered station and returns the weather and pollutant frames stacked
+    with a 'location' column. At most FETCH_MAX_CONCURRENCY upstream calls run at once;
+    a station that fails is logged and skipped so it cannot block the rest of the batch.
+    """
+    stations = stations or load_stations()
+
+    today = _today()
+    from_date = from_date or today
+    to_date = today
+
+    # Submit everything up front; the shared executor bounds how many calls are in flight
+    pending = [(station, _submit_station(station, from_date, to_date)) for station in stations]
+
+    weather_frames, pollutant_frames = [], []
+    for station, futures in pending:
+        try:
+            weather_df, pollutant_df = _collect_station(station, futures, today)
+        except Exception as e:
+            print(f"Fetching station {station['location']} failed: {e}")
+            continue
+        weather_frames.append(weather_df)
+        pollutant_frames.append(pollutant_df)
+
+    if not weather_frames:
+        raise RuntimeError("Fetching failed for every station.")
+
+    return pd.concat(weather_frames, ignore_index=True), pd.concat(pollutant_frames, ignore_index=True)
+
+
+def parse_weather_response(weather_response):
     weather_data = []
     for day in weather_response.get("days", []):
         weather_data.append({
@@ -64,11 +231,10 @@ def fetch_data_from_apis(from_date=None):
             "stations": ",".join(day.get("stations", [])) if day.get("stations") else None
         })
     print(weather_data)
-    weather_df = pd.DataFrame(weather_data)
+    return pd.DataFrame(weather_data)
 
-    # Pollutant API call
-    pollutant_url = f"https://api.waqi.info/feed/{STATION}/?token={POLLUTANT_API_KEY}"
-    pollutant_response = requests.get(pollutant_url).json()
+
+def parse_pollutant_response(pollutant_response, today):
     iaqi = pollutant_response.get("data", {}).get("iaqi", {})
 
     pollutant_df = pd.DataFrame([{
@@ -88,4 +254,4 @@ def fetch_data_from_apis(from_date=None):
         "AQI": pollutant_response.get("data", {}).get("aqi")
     }])
     print(pollutant_df)
-    return weather_df, pollutant_df
+    return pollutant_df
@@ -1,36 +1,47 @@
 # forecast.py
 
-import os
-import joblib
 import numpy as np
+import pandas as pd
 from zoneinfo import ZoneInfo # for timezone handling
 from datetime import datetime, timedelta
-from scripts.train_model import load_data, engineer_additional_features, create_lag_features, train_model
+from scripts import metrics
+from scripts.model_registry import get_model, get_model_metadata, model_exists, validate_features
+from scripts.features import build_feature_matrix
+from scripts.stations import DEFAULT_LOCATION, load_stations
+from scripts.train_model import train_model
+from scripts.feature_store import get_latest_features, compute_latest_features, load_window
+from scripts.update_database import backfill_model_name, upsert_aqi_forecasts
+
+# Days ahead predicted from each origin date
+FORECAST_HORIZON = 7
 
 """ BASE_DIR = Path(__file__).resolve().parent.parent
 DATASETS_DIR = BASE_DIR / "ML_models"
 MODEL_PATH = DATASETS_DIR / "xgboost_model.pkl" """
 
-# for render
-MODEL_PATH = '/app/data/xgboost_model.pkl'
-
-def get_aqi_forecast():
-    """Generates a forecast for the next 7 days using the latest data"""
+def get_aqi_forecast(location=DEFAULT_LOCATION):
+    """Generates a forecast for the next 7 days using the latest data for a station"""
 
     # Retrain the model if not found
-    if not os.path.exists(MODEL_PATH):
+    if not model_exists():
         print("Model not found. Retraining...")
         train_model()
 
-    data = load_data()
-    data = engineer_additional_features(data)
-    data = create_lag_features(data)
-    
-    last_row = data.iloc[[-1]]
-    X_last = last_row.drop(columns=['AQI', 'date'], errors='ignore')
+    # Read the precomputed feature vector for the latest day, or build it from the last few days
+    X_last = get_latest_features(location)
+    if X_last is None:
+        print(f"No stored features for {location}. Computing from recent history...")
+        X_last = compute_latest_features(location)
+    if X_last is None:
+        raise ValueError(f"Not enough history for {location} to build forecast features.")
 
-    model = joblib.load(MODEL_PATH)
-    predictions = model.predict(X_last)
+    # Served from the in-process cache; only reloaded after a retrain
+    model = get_model()
+
+    # Check the inputs against the model's feature schema and align them with its column order
+    X_last = X_last[validate_features(model, X_last.columns)]
+    with metrics.span("predict"):
+        predictions = model.predict(X_last)
 
     # Ensure predictions is a flat NumPy array
     if isinstance(predictions, (list, tuple)):
@@ -55,6 +66,61 @@ def get_aqi_forecast():
     return forecast
 
 
+def batch_forecast(origin_dates, locations=None, store=True):
+    """
+    Forecasts as they would have been made on each origin date (using data up to that day) for
+    each location. Feature rows for all origins come from one feature pass per location and are
+    stacked for a single predict call. Returns a DataFrame of (location, forecast_date,
+    predicted_date, predicted_aqi), upserted into aqi_forecast in one batch when store is True.
+    Origins without enough history (or no data) are skipped.
+    """
+    origins = pd.DatetimeIndex(pd.to_datetime(origin_dates)).normalize().unique().sort_values()
+    if locations is None:
+        locations = [station["location"] for station in load_stations()]
+
+    if not model_exists():
+        print("Model not found. Retraining...")
+        train_model()
+    model = get_model()
+
+    blocks, row_locations, row_dates, columns = [], [], [], None
+    for location in locations:
+        features = build_feature_matrix(load_window(location, origins[0].date(), origins[-1].date()))
+        selected = np.isin(features.dates, origins.to_numpy())
+        blocks.append(features.values[selected])
+        row_locations += [location] * int(selected.sum())
+        row_dates.append(features.dates[selected])
+        columns = features.columns
+
+    n_rows = len(row_locations)
+    if n_rows == 0:
+        print("No origin dates with enough history to forecast.")
+        return pd.DataFrame(columns=['location', 'forecast_date', 'predicted_date', 'predicted_aqi'])
+
+    X = pd.DataFrame(np.vstack(blocks), columns=columns).drop(columns='AQI')
+    X = X[validate_features(model, X.columns)]
+    with metrics.span("predict"):
+        predictions = np.asarray(model.predict(X)).reshape(n_rows, FORECAST_HORIZON)
+
+    # One output row per (origin, horizon day), in the same vectorized layout as the predictions
+    forecast_dates = pd.DatetimeIndex(np.concatenate(row_dates))
+    horizon = np.tile(np.arange(1, FORECAST_HORIZON + 1), n_rows)
+    forecasts = pd.DataFrame({
+        'location': np.repeat(row_locations, FORECAST_HORIZON),
+        'forecast_date': forecast_dates.repeat(FORECAST_HORIZON).date,
+        'predicted_date': (forecast_dates.repeat(FORECAST_HORIZON) + pd.to_timedelta(horizon, unit='D')).date,
+        'predicted_aqi': np.round(predictions.ravel().astype(float), 2),
+    })
+
+    if store:
+        # Tagged as backfills: stored next to (never over) the live forecasts, and left out of accuracy scoring
+        model_name = backfill_model_name(get_model_metadata().get("version", "legacy"))
+        upsert_aqi_forecasts(forecasts.assign(model_name=model_name).to_dict(orient='records'), backfill=True)
+    print(f"Forecast {n_rows} origin date(s) across {len(locations)} location(s) from "
+          f"{origins[0]:%Y-%m-%d} to {origins[-1]:%Y-%m-%d}.")
+    return forecasts
+
+
 # Example usage
 if __name__ == '__main__':
     forecast = get_aqi_forecast()
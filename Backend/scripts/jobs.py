@@ -0,0 +1,130 @@
+# jobs.py
+
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from scripts.db import advisory_lock, get_engine
+from scripts.schema import ensure_schema
+
+# Background workers for long-running tasks, so HTTP handlers can return immediately. Each job also
+# has a row in job_runs, since the status request may reach a different web worker than the submit.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "100"))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_active = {}
+
+
+_JOB_COLUMNS = ["id", "name", "status", "created_at", "started_at", "finished_at", "error"]
+
+
+def _snapshot(job):
+    return {key: value for key, value in job.items() if key != "func"}
+
+
+def _save(job):
+    """Upserts the job's row and trims job_runs to the newest JOB_HISTORY_SIZE rows"""
+    try:
+        engine = get_engine()
+        ensure_schema(engine)
+        with engine.begin() as conn:
+            conn.execute(text(f"""
+                INSERT INTO job_runs ({", ".join(_JOB_COLUMNS)})
+                VALUES ({", ".join(f":{col}" for col in _JOB_COLUMNS)})
+                ON CONFLICT (id) DO UPDATE SET
+                    status = EXCLUDED.status, started_at = EXCLUDED.started_at,
+                    finished_at = EXCLUDED.finished_at, error = EXCLUDED.error
+            """), {col: job[col] for col in _JOB_COLUMNS})
+            if job["status"] == "queued":
+                conn.execute(text("""
+                    DELETE FROM job_runs WHERE created_at <
+                        (SELECT created_at FROM job_runs ORDER BY created_at DESC OFFSET :keep LIMIT 1)
+                """), {"keep": JOB_HISTORY_SIZE - 1})
+    except Exception as e:
+        # The job still runs and this worker can still report it; only the other workers can't
+        print(f"Could not record job {job['name']} ({job['id']}) as {job['status']}: {e}")
+
+
+def submit_job(name, func, *args, **kwargs):
+    """
+    Queues func(*args, **kwargs) under a job name and returns (job, created).
+
+    Jobs are single-flight per name: while one is queued or running, submitting the same
+    name returns that job (created=False) instead of starting another. Across processes
+    the run is also guarded by a database advisory lock, so a duplicate that still slips
+    through finishes as 'skipped' rather than running twice.
+    """
+    with _lock:
+        active_id = _active.get(name)
+        if active_id is not None:
+            return _snapshot(_jobs[active_id]), False
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "name": name,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        _jobs[job["id"]] = job
+        _active[name] = job["id"]
+
+        # Keep a bounded history of finished jobs for the status endpoint
+        while len(_jobs) > JOB_HISTORY_SIZE:
+            oldest_id = next(iter(_jobs))
+            if oldest_id in _active.values():
+                break
+            _jobs.popitem(last=False)
+
+    _save(job)
+    _executor.submit(_run, job, func, args, kwargs)
+    return _snapshot(job), True
+
+
+def _run(job, func, args, kwargs):
+    job["status"] = "running"
+    job["started_at"] = time.time()
+    _save(job)
+    try:
+        with advisory_lock(f"job:{job['name']}") as acquired:
+            if not acquired:
+                job["status"] = "skipped"
+                print(f"Job {job['name']} ({job['id']}) skipped: already running in another process.")
+                return
+            func(*args, **kwargs)
+        job["status"] = "succeeded"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        print(f"Job {job['name']} ({job['id']}) failed: {e}")
+        traceback.print_exc()
+    finally:
+        job["finished_at"] = time.time()
+        _save(job)
+        with _lock:
+            if _active.get(job["name"]) == job["id"]:
+                del _active[job["name"]]
+
+
+def get_job(job_id):
+    """A job submitted by this process, else its row from job_runs (submitted by another worker)"""
+    job = _jobs.get(job_id)
+    if job is not None:
+        return _snapshot(job)
+
+    engine = get_engine()
+    ensure_schema(engine)
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"SELECT {', '.join(_JOB_COLUMNS)} FROM job_runs WHERE id = :id"), {"id": job_id}
+        ).mappings().first()
+    return dict(row) if row is not None else None
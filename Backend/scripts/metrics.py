@@ -0,0 +1,159 @@
+# metrics.py
+
+import os
+import time
+import bisect
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+# Instrumentation switch; when off, spans and counters return before touching any state
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Upper bounds (seconds) of the duration histograms: sub-millisecond queries up to full retrains
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+HELP = {
+    "aqi_stage_duration_seconds": "Wall time of pipeline stages (API calls, database updates, training, prediction)",
+    "aqi_stage_errors_total": "Pipeline stages that raised",
+    "aqi_http_request_duration_seconds": "Flask request handling time by route",
+    "aqi_http_requests_total": "Flask requests by route and status",
+    "aqi_db_query_duration_seconds": "SQL statement execution time by statement type",
+    "aqi_db_query_errors_total": "SQL statements that failed",
+    "aqi_upstream_calls_total": "Calls to the weather and pollutant APIs",
+    "aqi_fetch_cache_requests_total": "Current-data requests by cache outcome (fresh, stale, miss, coalesced)",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    """Adds one observation to a histogram with DURATION_BUCKETS"""
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    bucket = bisect.bisect_left(DURATION_BUCKETS, value)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # Per-bucket counts (the last one is +Inf), made cumulative when rendered
+            histogram = _histograms[key] = {"buckets": [0] * (len(DURATION_BUCKETS) + 1), "sum": 0.0, "count": 0}
+        histogram["buckets"][bucket] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+@contextmanager
+def span(stage):
+    """Times a block as aqi_stage_duration_seconds{stage=...}, counting it in aqi_stage_errors_total if it raises"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("aqi_stage_errors_total", stage=stage)
+        raise
+    finally:
+        observe("aqi_stage_duration_seconds", time.perf_counter() - start, stage=stage)
+
+
+def timed(stage):
+    """Decorator form of span()"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return func(*args, **kwargs)
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    # The leading keyword keeps the label set small (SELECT, INSERT, ALTER, ...)
+    observe("aqi_db_query_duration_seconds", time.perf_counter() - start, statement=statement.split(None, 1)[0].upper())
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+    inc("aqi_db_query_errors_total")
+
+
+def instrument_engine(engine):
+    """Times every statement the engine executes (no listeners are attached when metrics are off)"""
+    if not METRICS_ENABLED:
+        return
+    from sqlalchemy import event
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """All counters and histograms in the Prometheus text exposition format (0.0.4)"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                      for key, h in _histograms.items()}
+
+    lines = []
+    for metric_type, series in (("counter", counters), ("histogram", histograms)):
+        for name in sorted({name for name, _ in series}):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for (series_name, labels), value in sorted(series.items()):
+                if series_name != name:
+                    continue
+                if metric_type == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS + ("+Inf",), value["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Clears every series (e.g. between benchmark runs)"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
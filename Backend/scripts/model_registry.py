@@ -0,0 +1,231 @@
+# model_registry.py
+
+import os
+import glob
+import json
+import time
+import hashlib
+import threading
+from scripts import metrics
+
+# Versioned model artifacts: <name>.ubj (native XGBoost booster) + <name>.json (manifest),
+# with current.json pointing at the live version
+MODEL_DIR = os.getenv("MODEL_DIR", "/app/data/models")
+MODEL_KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "5"))
+CURRENT_MANIFEST = "current.json"
+# Re-hash the booster on every load; otherwise only its size is checked against the manifest
+MODEL_VERIFY_HASH = os.getenv("MODEL_VERIFY_HASH", "false").lower() in ("1", "true", "yes")
+
+# for render: pickles written before the artifact format; only read when no manifest exists yet
+LEGACY_MODEL_PATH = '/app/data/xgboost_model.pkl'
+
+# In-process cache of the deserialized model, shared by every request in this worker
+_lock = threading.Lock()
+_model = None
+_model_mtime = None
+_manifest = {}
+_version = 0
+
+_stats = {
+    "hits": 0,
+    "misses": 0,
+    "loads": 0,
+    "last_load_seconds": None,
+    "total_load_seconds": 0.0,
+}
+
+
+def _current_path(model_dir):
+    return os.path.join(model_dir, CURRENT_MANIFEST)
+
+
+def _source(model_dir):
+    """Returns (path, mtime) of what get_model would load: the current manifest, else the legacy pickle"""
+    for path in (_current_path(model_dir), LEGACY_MODEL_PATH):
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            continue
+    return None, None
+
+
+def model_exists(model_dir=MODEL_DIR):
+    return _source(model_dir)[0] is not None
+
+
+def _read_manifest(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _load_artifact(model_dir):
+    """Loads the booster named by current.json, checking it against the manifest"""
+    manifest = _read_manifest(_current_path(model_dir))
+    with open(os.path.join(model_dir, manifest["booster"]), "rb") as f:
+        raw = f.read()
+    if len(raw) != manifest["size_bytes"] or (MODEL_VERIFY_HASH and hashlib.sha256(raw).hexdigest()[:12] != manifest["version"]):
+        raise ValueError(f"Model artifact {manifest['booster']} does not match its manifest version {manifest['version']}")
+
+    from xgboost import XGBRegressor  # Imported on first load, so reading stats doesn't pull in xgboost
+    model = XGBRegressor()
+    model.load_model(bytearray(raw))
+    return model, manifest
+
+
+def _swap(model, mtime, manifest):
+    """Replaces the cached model in one step so readers never see a half-updated state"""
+    global _model, _model_mtime, _manifest, _version
+    _model, _model_mtime, _manifest = model, mtime, manifest
+    _version += 1
+
+
+def get_model(model_dir=MODEL_DIR):
+    """Returns the cached model, reloading it only when a new version has been published"""
+    path, mtime = _source(model_dir)
+    if path is None:
+        raise FileNotFoundError(f"No model found in {model_dir} or at {LEGACY_MODEL_PATH}")
+
+    model = _model
+    if model is not None and _model_mtime == mtime:
+        _stats["hits"] += 1
+        return model
+
+    with _lock:
+        # Another thread may have reloaded the model while we were waiting
+        path, mtime = _source(model_dir)
+        if _model is not None and _model_mtime == mtime:
+            _stats["hits"] += 1
+            return _model
+
+        _stats["misses"] += 1
+        start = time.perf_counter()
+        if path == LEGACY_MODEL_PATH:
+            print(f"No model manifest in {model_dir}. Falling back to the legacy pickle {path}")
+            import joblib
+            model, manifest = joblib.load(path), {}
+        else:
+            model, manifest = _load_artifact(model_dir)
+        elapsed = time.perf_counter() - start
+
+        metrics.observe("aqi_stage_duration_seconds", elapsed, stage="model_load")
+        _stats["loads"] += 1
+        _stats["last_load_seconds"] = round(elapsed, 6)
+        _stats["total_load_seconds"] += elapsed
+        _swap(model, mtime, manifest)
+        print(f"Model {manifest.get('version', 'legacy')} loaded from {path} in {elapsed:.3f}s (version {_version})")
+        return model
+
+
+def preload_model(model_dir=MODEL_DIR):
+    """
+    Loads the current model before any request asks for it, e.g. in gunicorn's master so forked
+    workers share it copy-on-write. Returns False when nothing has been published yet.
+    """
+    if not model_exists(model_dir):
+        return False
+    get_model(model_dir)
+    return True
+
+
+def get_model_metadata(model_dir=MODEL_DIR):
+    """Manifest of the current model (feature order, training window, metrics, params), or {}"""
+    try:
+        return _read_manifest(_current_path(model_dir))
+    except FileNotFoundError:
+        return {}
+
+
+def validate_features(model, columns):
+    """
+    Returns the columns in the order the model was trained on, raising ValueError when the
+    inputs do not carry exactly the features recorded for the loaded model.
+    """
+    expected = _manifest.get("feature_names") if model is _model else None
+    expected = expected or model.get_booster().feature_names
+    if not expected:
+        return list(columns)
+
+    missing = [name for name in expected if name not in columns]
+    unexpected = [name for name in columns if name not in expected]
+    if missing or unexpected:
+        raise ValueError(f"Feature schema mismatch: missing {missing}, unexpected {unexpected}")
+    return list(expected)
+
+
+def _write_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _prune(model_dir, keep_name):
+    # Oldest first thanks to the timestamp in the name; the live version is never removed
+    names = sorted(os.path.basename(path)[:-len(".ubj")] for path in glob.glob(os.path.join(model_dir, "xgboost_model-*.ubj")))
+    for name in names[:-MODEL_KEEP_VERSIONS] if MODEL_KEEP_VERSIONS > 0 else []:
+        if name == keep_name:
+            continue
+        for extension in (".ubj", ".json"):
+            try:
+                os.remove(os.path.join(model_dir, name + extension))
+            except FileNotFoundError:
+                pass
+
+
+def publish_model(model, metadata=None, model_dir=MODEL_DIR):
+    """
+    Persists a newly trained model as a versioned booster + manifest, points current.json at it
+    and makes it the active one in this process. Returns the manifest.
+    """
+    import xgboost as xgb
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Native UBJSON booster; the version is a hash of its bytes, so identical models share a version
+    tmp_path = os.path.join(model_dir, f"publish.{os.getpid()}.tmp.ubj")
+    model.save_model(tmp_path)
+    with open(tmp_path, "rb") as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:12]
+    name = f"xgboost_model-{time.strftime('%Y%m%dT%H%M%S')}-{version}"
+    os.replace(tmp_path, os.path.join(model_dir, f"{name}.ubj"))
+
+    booster = model.get_booster()
+    manifest = {
+        **(metadata or {}),
+        "version": version,
+        "booster": f"{name}.ubj",
+        "format": "ubj",
+        "size_bytes": len(raw),
+        "xgboost_version": xgb.__version__,
+        "feature_names": booster.feature_names,
+        "num_boosted_rounds": booster.num_boosted_rounds(),
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    def write_manifest(path):
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+
+    # Versioned manifest first, then the pointer, so current.json never names a missing file
+    _write_atomic(os.path.join(model_dir, f"{name}.json"), write_manifest)
+    with _lock:
+        _write_atomic(_current_path(model_dir), write_manifest)
+        _swap(model, os.stat(_current_path(model_dir)).st_mtime_ns, manifest)
+
+    _prune(model_dir, name)
+    print(f"Model {version} published to {os.path.join(model_dir, name)}.ubj (version {_version})")
+    return manifest
+
+
+def get_registry_stats():
+    """Returns load-time and cache hit/miss counters for the model cache"""
+    return {
+        "version": _version,
+        "model_version": _manifest.get("version"),
+        "format": _manifest.get("format", "pickle" if _model is not None else None),
+        "loaded": _model is not None,
+        "hits": _stats["hits"],
+        "misses": _stats["misses"],
+        "loads": _stats["loads"],
+        "last_load_seconds": _stats["last_load_seconds"],
+        "total_load_seconds": round(_stats["total_load_seconds"], 6),
+    }
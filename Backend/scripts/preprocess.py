@@ -1,5 +1,6 @@
 # preprocess.py
 
+import numpy as np
 import pandas as pd
 
 # Define the AQI calculation function for a given pollutant
@@ -31,25 +32,79 @@ breakpoints_no2 = [(0, 40, 0, 50), (41, 80, 51, 100), (81, 180, 101, 200), (181,
 breakpoints_so2 = [(0, 40, 0, 50), (41, 80, 51, 100), (81, 380, 101, 200), (381, 800, 201, 300), (801, 1600, 301, 400), (1601, 3000, 401, 500)]
 breakpoints_co = [(0, 1.0, 0, 50), (1.1, 2.0, 51, 100), (2.1, 10, 101, 200), (10.1, 17.0, 201, 300), (17.1, 34.0, 301, 400), (34.1, 50, 401, 500)]
 
+POLLUTANT_BREAKPOINTS = {
+    'pm25': breakpoints_pm25,
+    'pm10': breakpoints_pm10,
+    'o3': breakpoints_o3,
+    'no2': breakpoints_no2,
+    'so2': breakpoints_so2,
+    'co': breakpoints_co,
+}
+
+# Precompile each breakpoint table into column arrays (C_LO, C_HI, I_LO, I_HI) once at import
+_BREAKPOINT_ARRAYS = {
+    pollutant: tuple(np.asarray(breakpoints, dtype=float).T)
+    for pollutant, breakpoints in POLLUTANT_BREAKPOINTS.items()
+}
+
+def calculate_aqi_array(concentrations, pollutant, scale=False):
+    """
+    Vectorized equivalent of calculate_aqi for a whole column of concentrations.
+
+    The upper bounds of each table are increasing, so np.searchsorted finds the first range
+    whose C_HI is >= the concentration, which is the same range the loop in calculate_aqi stops at.
+    Values that fall in a gap between ranges (e.g. 30 < pm25 < 31), below the first range,
+    above the last range or that are NaN always map to NaN, matching calculate_aqi returning None.
+    """
+    c_lo, c_hi, i_lo, i_hi = _BREAKPOINT_ARRAYS[pollutant]
+    concentrations = np.asarray(concentrations, dtype=float)
+
+    idx = np.searchsorted(c_hi, concentrations, side='left')
+    idx_safe = np.minimum(idx, len(c_hi) - 1)
+    in_range = (idx < len(c_hi)) & (concentrations >= c_lo[idx_safe])
+
+    if scale:
+        values = (i_hi[idx_safe] - i_lo[idx_safe]) / (c_hi[idx_safe] - c_lo[idx_safe]) \
+            * (concentrations - c_lo[idx_safe]) + i_lo[idx_safe]
+    else:
+        values = concentrations
+
+    return np.where(in_range, values, np.nan)
+
+def calculate_aqi_batch(df, scale=False):
+    """Computes all six sub-indices and the overall AQI for a DataFrame in one pass"""
+    sub_indices = np.column_stack([
+        calculate_aqi_array(df[pollutant].to_numpy(dtype=float, na_value=np.nan), pollutant, scale=scale)
+        for pollutant in POLLUTANT_BREAKPOINTS
+    ])
+
+    result = pd.DataFrame(
+        sub_indices,
+        columns=[f'AQI_{pollutant}' for pollutant in POLLUTANT_BREAKPOINTS],
+        index=df.index,
+    )
+    # fmax skips NaN like DataFrame.max(axis=1) and leaves all-NaN rows as NaN
+    result['AQI'] = np.fmax.reduce(sub_indices, axis=1)
+    return result
+
 
 def preprocess_pollutant_data(df):
     # Strip column names
     df.columns = df.columns.str.strip()
 
-    # Convert to numeric
+    # Convert to numeric, interpolating within each station when several are stacked together
     cols = ['pm25', 'pm10', 'o3', 'no2', 'so2', 'co']
     for col in cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').interpolate(method='linear')
-
-    # AQI calculation (reuse your existing calculate_aqi() logic here)
-    # Assume calculate_aqi() and breakpoints are defined above
-    df['AQI_pm25'] = df['pm25'].apply(lambda x: calculate_aqi(x, breakpoints_pm25))
-    df['AQI_pm10'] = df['pm10'].apply(lambda x: calculate_aqi(x, breakpoints_pm10))
-    df['AQI_o3'] = df['o3'].apply(lambda x: calculate_aqi(x, breakpoints_o3))
-    df['AQI_no2'] = df['no2'].apply(lambda x: calculate_aqi(x, breakpoints_no2))
-    df['AQI_so2'] = df['so2'].apply(lambda x: calculate_aqi(x, breakpoints_so2))
-    df['AQI_co'] = df['co'].apply(lambda x: calculate_aqi(x, breakpoints_co))
-    df['AQI'] = df[['AQI_pm25', 'AQI_pm10', 'AQI_o3', 'AQI_no2', 'AQI_so2', 'AQI_co']].max(axis=1)
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+        if 'location' in df.columns:
+            df[col] = df.groupby('location')[col].transform(lambda s: s.interpolate(method='linear'))
+        else:
+            df[col] = df[col].interpolate(method='linear')
+
+    # AQI calculation for all pollutants at once (same results as calculate_aqi per row)
+    aqi = calculate_aqi_batch(df)
+    for col in aqi.columns:
+        df[col] = aqi[col]
 
     df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
     return df
@@ -58,11 +113,24 @@ def preprocess_weather_data(df):
     df.columns = df.columns.str.strip()
     df['date'] = pd.to_datetime(df['date'], errors='coerce')
     df = df.drop(columns=['datetime'], errors='ignore')
-    df = df.sort_values('date').drop_duplicates(subset='date')
+    keys = ['location', 'date'] if 'location' in df.columns else ['date']
+    df = df.sort_values(keys).drop_duplicates(subset=keys)
     
     # Convert object columns to inferred types  
     df = df.infer_objects()
-    df = df.interpolate(method='linear').bfill()  # This would replace the deprecated `fillna`
+    # Text columns can't be interpolated; they are only backfilled
+    numeric_cols = df.select_dtypes(include=['number', 'datetime']).columns
+    if 'location' in df.columns:
+        # Fill gaps per station so one station's readings never leak into another's; only the
+        # value columns go through the groups, so 'location' stays in place for the (location, date) key
+        value_cols = [col for col in df.columns if col != 'location']
+        df[numeric_cols] = df.groupby('location', sort=False)[numeric_cols].transform(
+            lambda s: s.interpolate(method='linear')
+        )
+        df[value_cols] = df.groupby('location', sort=False)[value_cols].bfill()
+    else:
+        df[numeric_cols] = df[numeric_cols].interpolate(method='linear')
+        df = df.bfill()  # This would replace the deprecated `fillna`
     
     df['date'] = df['date'].dt.strftime('%Y-%m-%d')
     return df
@@ -0,0 +1,104 @@
+# query_plans.py
+#
+# Checks that the hot queries, built exactly as the app builds them, are served by their indexes:
+#   python -m scripts.query_plans
+# Kept out of scripts/schema.py so the schema layer doesn't depend on the web module.
+
+import sys
+from sqlalchemy import text
+from app import ALLOWED_TABLES, LATEST_FORECAST_QUERY, build_view_query, encode_cursor, get_keyset_columns
+from scripts.db import get_engine
+from scripts.schema import ensure_schema
+from scripts.stations import DEFAULT_LOCATION
+
+
+def _view_data_index(table):
+    if table == 'aqi_forecast':
+        return 'aqi_forecast_forecast_date_predicted_date_location_key'
+    if table == 'model_evaluation':
+        return 'model_evaluation_timestamp_idx'
+    return f"{table}_date_idx"
+
+
+def _plan_queries():
+    """
+    (name, SQL, params, indexes) of the queries the app runs on every request or job, as the app
+    builds them, with the indexes declared to serve each (any one of them will do)
+    """
+    cursor_values = {'forecast_date': '2024-01-01', 'predicted_date': '2024-01-02', 'location': DEFAULT_LOCATION,
+                     'timestamp': '2024-01-01T00:00:00', 'date': '2024-01-01'}
+    queries = [
+        ("get_forecast", LATEST_FORECAST_QUERY, {"location": DEFAULT_LOCATION}, [_view_data_index('aqi_forecast')]),
+    ]
+    for table in ALLOWED_TABLES:
+        query, params = build_view_query(table, '2024-01-01', '2024-01-31', limit=100)
+        queries.append((f"view_data {table} date range", query, params, [_view_data_index(table)]))
+        cursor = encode_cursor([cursor_values[col] for col in get_keyset_columns(table)])
+        query, params = build_view_query(table, after=cursor, limit=100)
+        queries.append((f"view_data {table} next page", query, params, [_view_data_index(table)]))
+
+    # Per-station reads: the primary key, or the date index when every row belongs to one station
+    cleaned_data_indexes = ['cleaned_data_pkey', 'cleaned_data_date_idx']
+    queries += [
+        ("load_data window", "SELECT * FROM cleaned_data WHERE location = :location AND date >= :since AND date <= :until "
+                             "ORDER BY date", {"location": DEFAULT_LOCATION, "since": '2024-01-01', "until": '2024-12-31'},
+         cleaned_data_indexes),
+        ("load_data last_n_days", "SELECT * FROM (SELECT * FROM cleaned_data WHERE location = :location "
+                                  "ORDER BY date DESC LIMIT :limit) AS tail ORDER BY date",
+         {"location": DEFAULT_LOCATION, "limit": 14}, cleaned_data_indexes),
+        ("score_forecasts join", """
+            SELECT f.predicted_aqi, c."AQI"
+            FROM aqi_forecast f
+            JOIN cleaned_data c ON c.location = f.location AND c.date = f.predicted_date
+            WHERE f.location = :location AND f.predicted_date BETWEEN :since AND :until
+        """, {"location": DEFAULT_LOCATION, "since": '2024-01-01', "until": '2024-01-01'},
+         ['aqi_forecast_predicted_date_idx']),
+        ("get_forecast_accuracy", "SELECT horizon, SUM(n) FROM forecast_accuracy WHERE location = :location "
+                                  "AND predicted_date > :since GROUP BY horizon",
+         {"location": DEFAULT_LOCATION, "since": '2024-01-01'}, ['forecast_accuracy_pkey']),
+    ]
+    return queries
+
+
+def _scans(plan):
+    """(node type, relation, index) of every scan node of an EXPLAIN (FORMAT JSON) plan"""
+    scans = []
+    if "Scan" in plan["Node Type"]:
+        scans.append((plan["Node Type"], plan.get("Relation Name"), plan.get("Index Name")))
+    for child in plan.get("Plans", []):
+        scans += _scans(child)
+    return scans
+
+
+def check_plans(engine=None):
+    """
+    EXPLAINs the hot queries with sequential scans discouraged (enable_seqscan = off) and returns
+    the names of those that still use a Seq Scan, or don't use the index declared for them (e.g.
+    walking the (location, date) key for a date range across stations). Postgres only: the app's
+    SQL (ON CONFLICT, advisory locks, DATE arithmetic) doesn't run on SQLite.
+    """
+    engine = engine or get_engine()
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError(f"Query plans can only be checked on PostgreSQL, not {engine.dialect.name}.")
+    ensure_schema(engine)
+
+    failures = []
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        for name, query, params, indexes in _plan_queries():
+            plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params).scalar()[0]["Plan"]
+            scans = _scans(plan)
+            seq_scans = [relation for node, relation, _ in scans if node == "Seq Scan"]
+            used = {index for _, _, index in scans if index}
+            if seq_scans or not used.intersection(indexes):
+                failures.append(name)
+                detail = f"Seq Scan on {', '.join(seq_scans)}" if seq_scans else f"uses {sorted(used) or 'no index'}"
+                print(f"FAIL  {name}: {detail}, expected {' or '.join(indexes)}")
+            else:
+                print(f"ok    {name}")
+    return failures
+
+
+if __name__ == '__main__':
+    if check_plans():
+        sys.exit(1)
@@ -0,0 +1,85 @@
+# response_cache.py
+
+import os
+import time
+import hashlib
+import threading
+from collections import namedtuple
+
+# Optional directory holding a generation stamp, so an invalidation in one process
+# (e.g. the worker that ran the hourly job) also expires the caches of sibling workers
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR")
+
+# Maximum age of an entry in seconds (0 for none). Without RESPONSE_CACHE_DIR, an invalidation only
+# reaches the process that made the write, so sibling gunicorn workers, or a web worker when the
+# hourly job ran as its own process, pick up new data after at most this long
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+
+CacheEntry = namedtuple("CacheEntry", ["generation", "body", "etag", "last_modified"])
+
+_lock = threading.Lock()
+_entries = {}
+_local_generation = {}
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _stamp_path(key):
+    return os.path.join(RESPONSE_CACHE_DIR, f"{key}.generation")
+
+
+def current_generation(key):
+    """Generation of a cache key; entries stored under an older generation are stale"""
+    local = _local_generation.get(key, 0)
+    if not RESPONSE_CACHE_DIR:
+        return local
+    try:
+        return local, os.stat(_stamp_path(key)).st_mtime_ns
+    except FileNotFoundError:
+        return local, None
+
+
+def get(key, variant=None):
+    """Cached entry of a key (one per variant, e.g. per location), or None when missing or stale"""
+    entry = _entries.get((key, variant))
+    expired = entry is not None and RESPONSE_CACHE_TTL > 0 and time.time() - entry.last_modified >= RESPONSE_CACHE_TTL
+    if entry is not None and not expired and entry.generation == current_generation(key):
+        _stats["hits"] += 1
+        return entry
+    _stats["misses"] += 1
+    return None
+
+
+def put(key, body, generation, variant=None):
+    """
+    Stores pre-serialized bytes. Pass the generation read before building the body,
+    so a response built while an invalidation was happening is never kept as fresh.
+    """
+    entry = CacheEntry(
+        generation=generation,
+        body=body,
+        etag=hashlib.sha1(body).hexdigest(),
+        last_modified=time.time(),
+    )
+    with _lock:
+        _entries[(key, variant)] = entry
+    return entry
+
+
+def invalidate(*keys):
+    """Expires the given keys here and, when RESPONSE_CACHE_DIR is set, in every process sharing it"""
+    with _lock:
+        for key in keys:
+            _local_generation[key] = _local_generation.get(key, 0) + 1
+            for cached in [cached for cached in _entries if cached[0] == key]:
+                del _entries[cached]
+            _stats["invalidations"] += 1
+
+    if RESPONSE_CACHE_DIR:
+        os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+        for key in keys:
+            with open(_stamp_path(key), "w") as f:
+                f.write(str(time.time_ns()))
+
+
+def get_cache_stats():
+    return {"entries": len(_entries), **_stats}
@@ -0,0 +1,356 @@
+# schema.py
+
+import zlib
+from sqlalchemy import text
+from scripts.db import get_engine
+from scripts.stations import DEFAULT_LOCATION
+
+DATA_TABLES = ['weather_data', 'pollutant_data', 'raw_data', 'cleaned_data']
+
+WEATHER_NUMERIC_COLUMNS = [
+    "tempmax", "tempmin", "temp", "feelslikemax", "feelslikemin", "feelslike", "dew", "humidity",
+    "precip", "precipprob", "precipcover", "snow", "snowdepth", "windgust", "windspeed", "winddir",
+    "sealevelpressure", "cloudcover", "visibility", "solarradiation", "solarenergy", "uvindex",
+    "severerisk", "moonphase"
+]
+WEATHER_TEXT_COLUMNS = ["name", "preciptype", "sunrise", "sunset", "conditions", "description", "icon", "stations"]
+
+POLLUTANT_NUMERIC_COLUMNS = [
+    "pm25", "pm10", "o3", "no2", "so2", "co",
+    "AQI_pm25", "AQI_pm10", "AQI_o3", "AQI_no2", "AQI_so2", "AQI_co", "AQI"
+]
+POLLUTANT_TEXT_COLUMNS = []
+
+CLEANED_FEATURES = [
+    "date", "pm25", "pm10", "co", "no2", "so2", "o3", "AQI",
+    "tempmax", "tempmin", "temp", "humidity", "dew",
+    "windspeed", "winddir", "windgust", "precip", "cloudcover",
+    "visibility", "sealevelpressure"
+]
+
+# Running-aggregate tables: per (location, date) they keep <col>_sum and <col>_n for each numeric
+# column, so each new reading is folded in with one upsert and the stored mean stays exact
+AGGREGATE_TABLES = {
+    'weather_data': ('weather_data_agg', WEATHER_NUMERIC_COLUMNS, WEATHER_TEXT_COLUMNS),
+    'pollutant_data': ('pollutant_data_agg', POLLUTANT_NUMERIC_COLUMNS, POLLUTANT_TEXT_COLUMNS),
+}
+
+# Columns of each data table, in the order a fresh table is created with
+DATA_TABLE_COLUMNS = {
+    'weather_data': ['location', 'date'] + WEATHER_NUMERIC_COLUMNS + WEATHER_TEXT_COLUMNS,
+    'pollutant_data': ['location', 'date'] + POLLUTANT_NUMERIC_COLUMNS + POLLUTANT_TEXT_COLUMNS,
+    'raw_data': ['location', 'date'] + WEATHER_NUMERIC_COLUMNS + WEATHER_TEXT_COLUMNS
+                + POLLUTANT_NUMERIC_COLUMNS + POLLUTANT_TEXT_COLUMNS,
+    'cleaned_data': ['location'] + CLEANED_FEATURES,
+}
+
+NUMERIC_COLUMNS = set(WEATHER_NUMERIC_COLUMNS + POLLUTANT_NUMERIC_COLUMNS)
+TEXT_COLUMNS = set(WEATHER_TEXT_COLUMNS + POLLUTANT_TEXT_COLUMNS + ['location'])
+
+# Typed columns of the forecast and evaluation tables
+AQI_FORECAST_COLUMNS = {
+    'forecast_date': 'DATE', 'predicted_date': 'DATE', 'predicted_aqi': 'REAL', 'model_name': 'TEXT', 'location': 'TEXT',
+}
+MODEL_EVALUATION_COLUMNS = {
+    'timestamp': 'TIMESTAMP', 'eval_date': 'DATE', 'mae': 'REAL', 'r2': 'REAL', 'rmse': 'REAL', 'mape': 'REAL',
+}
+
+# information_schema.columns.data_type of each DDL type, to tell which columns still need converting
+_DATA_TYPES = {
+    'DATE': 'date', 'REAL': 'real', 'TEXT': 'text', 'TIMESTAMP': 'timestamp without time zone',
+}
+
+# Serializes migrations across the web workers and the scheduled jobs
+SCHEMA_LOCK_KEY = zlib.crc32(b"schema_migrations")
+
+_schema_checked = False
+
+def _quote(col):
+    return f'"{col}"'
+
+def column_type(name):
+    """DDL type of a known data-table column (dates are DATE, measurements REAL), None if unknown"""
+    if name == 'date':
+        return 'DATE'
+    if name in NUMERIC_COLUMNS:
+        return 'REAL'
+    if name in TEXT_COLUMNS:
+        return 'TEXT'
+    return None
+
+def _table_exists(conn, name):
+    return conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+def _create_data_table(conn, table):
+    columns = [f"{_quote(col)} {column_type(col)}" for col in DATA_TABLE_COLUMNS[table]]
+    columns[0] += f" NOT NULL DEFAULT '{DEFAULT_LOCATION}'"
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})"))
+
+def _retype(conn, table, column_types):
+    """Converts the listed columns of table to their DDL type in one ALTER TABLE (a single rewrite)"""
+    current = dict(conn.execute(text(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = :table"
+    ), {"table": table}).fetchall())
+
+    alters = []
+    for col, ddl_type in column_types.items():
+        if col not in current or current[col] == _DATA_TYPES[ddl_type]:
+            continue
+        using = f"{_quote(col)}::{ddl_type.lower()}"
+        if ddl_type == 'REAL' and current[col] in ('text', 'character varying'):
+            # Text-stored measurements: empty strings become NULL instead of failing the cast
+            using = f"NULLIF(TRIM({_quote(col)}), '')::real"
+        alters.append(f"ALTER COLUMN {_quote(col)} TYPE {ddl_type} USING {using}")
+
+    if alters:
+        conn.execute(text(f"ALTER TABLE {table} {', '.join(alters)}"))
+        print(f"{table}: converted {len(alters)} column(s) to typed columns.")
+
+def _drop_undated_rows(conn, table):
+    # A row without a date can't be part of the (location, date) primary key, nor be forecast from
+    removed = conn.execute(text(f"DELETE FROM {table} WHERE date IS NULL")).rowcount
+    if removed:
+        print(f"{table}: removed {removed} row(s) without a date.")
+
+def _add_primary_key(conn, table):
+    """PRIMARY KEY (location, date), promoted from the existing unique index when there is one"""
+    has_key = conn.execute(text(
+        "SELECT 1 FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"
+    ), {"table": table}).first()
+    if has_key:
+        return
+    if _table_exists(conn, f"{table}_location_date_key"):
+        conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_location_date_key"))
+    else:
+        conn.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (location, date)"))
+
+def _create_date_index(conn, table):
+    # view_data and export filter by date across all stations and page in (date, location) order
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_date_idx ON {table} (date, location)"))
+
+def add_data_table_keys(conn, table):
+    """Primary key and date index of a data table, for tables recreated outside the migrations (bulk load)"""
+    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN location SET DEFAULT '{DEFAULT_LOCATION}'"))
+    _drop_undated_rows(conn, table)
+    _add_primary_key(conn, table)
+    _create_date_index(conn, table)
+
+def _baseline(conn):
+    """
+    Adds the 'location' key to tables created before multi-station ingestion (existing rows take
+    the default location), makes every data table unique per (location, date) so it can be upserted,
+    and creates the running-aggregate, feature, tuning, accuracy and bulk load tables. aqi_forecast
+    becomes unique per (forecast_date, predicted_date, location).
+    """
+    for table in DATA_TABLES:
+        _create_data_table(conn, table)
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS location TEXT NOT NULL DEFAULT '{DEFAULT_LOCATION}'"
+        ))
+        conn.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_location_date_key ON {table} (location, date)"
+        ))
+
+    for agg_table, numeric_cols, text_cols in AGGREGATE_TABLES.values():
+        columns = [f"{_quote(col + '_sum')} DOUBLE PRECISION NOT NULL DEFAULT 0" for col in numeric_cols]
+        columns += [f"{_quote(col + '_n')} INTEGER NOT NULL DEFAULT 0" for col in numeric_cols]
+        columns += [f"{_quote(col)} TEXT" for col in text_cols]
+        conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS {agg_table} (
+                location TEXT NOT NULL,
+                date DATE NOT NULL,
+                {", ".join(columns)},
+                PRIMARY KEY (location, date)
+            )
+        """))
+
+    # Precomputed model inputs per (location, date), kept in the model's column order
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS feature_store (
+            location TEXT NOT NULL,
+            date DATE NOT NULL,
+            features TEXT NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (location, date)
+        )
+    """))
+
+    # One row per (config, fold) of a tuning run, plus a fold-less summary row per config
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS model_tuning_results (
+            run_id TEXT NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            config_id INTEGER NOT NULL,
+            fold INTEGER,
+            params TEXT NOT NULL,
+            is_current BOOLEAN NOT NULL DEFAULT FALSE,
+            promoted BOOLEAN NOT NULL DEFAULT FALSE,
+            train_rows INTEGER,
+            val_rows INTEGER,
+            fit_seconds DOUBLE PRECISION,
+            mae DOUBLE PRECISION,
+            r2 DOUBLE PRECISION,
+            rmse DOUBLE PRECISION,
+            rmse_std DOUBLE PRECISION,
+            mape DOUBLE PRECISION
+        )
+    """))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS model_tuning_results_run_idx ON model_tuning_results (run_id, config_id)"
+    ))
+
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS aqi_forecast (
+            id SERIAL PRIMARY KEY,
+            {", ".join(f"{col} {ddl_type}" for col, ddl_type in AQI_FORECAST_COLUMNS.items())}
+        )
+    """))
+    conn.execute(text(
+        "ALTER TABLE aqi_forecast DROP CONSTRAINT IF EXISTS aqi_forecast_forecast_date_predicted_date_key"
+    ))
+    conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS aqi_forecast_forecast_date_predicted_date_location_key
+        ON aqi_forecast (forecast_date, predicted_date, location)
+    """))
+    # Scoring looks forecasts up by the day they predicted
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS aqi_forecast_predicted_date_idx ON aqi_forecast (predicted_date, location)"
+    ))
+
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS model_evaluation (
+            id SERIAL PRIMARY KEY,
+            {", ".join(f"{_quote(col)} {ddl_type}" for col, ddl_type in MODEL_EVALUATION_COLUMNS.items())}
+        )
+    """))
+
+    # Every forecast whose predicted day has been observed, with its error (predicted - observed)
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS forecast_errors (
+            location TEXT NOT NULL,
+            forecast_date DATE NOT NULL,
+            predicted_date DATE NOT NULL,
+            horizon INTEGER NOT NULL,
+            predicted_aqi DOUBLE PRECISION NOT NULL,
+            observed_aqi DOUBLE PRECISION NOT NULL,
+            error DOUBLE PRECISION NOT NULL,
+            scored_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (location, predicted_date, forecast_date)
+        )
+    """))
+    # Per (location, day, horizon) error sums; rolling MAE/RMSE is a SUM over a range of days
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS forecast_accuracy (
+            location TEXT NOT NULL,
+            predicted_date DATE NOT NULL,
+            horizon INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            abs_error_sum DOUBLE PRECISION NOT NULL,
+            sq_error_sum DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (location, predicted_date, horizon)
+        )
+    """))
+
+    # Committed progress of scripts/bulk_load.py, one row per table being imported
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS bulk_load_progress (
+            table_name TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            source_size BIGINT NOT NULL,
+            source_mtime BIGINT NOT NULL,
+            rows_loaded BIGINT NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """))
+
+def _typed_columns(conn):
+    """
+    DATE and REAL columns in place of the TIMESTAMP/TEXT/DOUBLE PRECISION ones to_sql created,
+    and (location, date) primary keys on the data tables
+    """
+    for table in DATA_TABLES:
+        _retype(conn, table, {col: column_type(col) for col in DATA_TABLE_COLUMNS[table]})
+        _drop_undated_rows(conn, table)
+        _add_primary_key(conn, table)
+
+    _retype(conn, 'aqi_forecast', AQI_FORECAST_COLUMNS)
+    _retype(conn, 'model_evaluation', MODEL_EVALUATION_COLUMNS)
+    # record_evaluation upserts on eval_date (same name as the UNIQUE constraint, so it's skipped if present)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS model_evaluation_eval_date_key ON model_evaluation (eval_date)"
+    ))
+
+def _date_indexes(conn):
+    """Indexes for the date-range and keyset queries of view_data and export, which don't filter by station"""
+    for table in DATA_TABLES:
+        _create_date_index(conn, table)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS model_evaluation_timestamp_idx ON model_evaluation (timestamp)"))
+
+def _job_runs(conn):
+    """Background job rows, so /api/jobs/<id> answers from whichever web worker the request reaches"""
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            created_at DOUBLE PRECISION NOT NULL,
+            started_at DOUBLE PRECISION,
+            finished_at DOUBLE PRECISION,
+            error TEXT
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS job_runs_created_at_idx ON job_runs (created_at)"))
+
+# Applied in order, each at most once; append new migrations, never edit an applied one
+MIGRATIONS = [
+    (1, "baseline: location keys, aggregate, feature, tuning, forecast accuracy and bulk load tables", _baseline),
+    (2, "DATE/REAL columns and (location, date) primary keys", _typed_columns),
+    (3, "date indexes for view_data and export", _date_indexes),
+    (4, "job_runs table for background job status", _job_runs),
+]
+
+def migrate(engine=None):
+    """
+    Applies the pending MIGRATIONS in one transaction and records each in schema_migrations.
+    A transaction-level advisory lock makes concurrent callers wait, then find nothing left to do.
+    Returns the versions applied.
+    """
+    engine = engine or get_engine()
+    applied_now = []
+    with engine.begin() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+            )
+        """))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+        for version, description, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            print(f"Applying schema migration {version}: {description}")
+            migration(conn)
+            conn.execute(text(
+                "INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"
+            ), {"version": version, "description": description})
+            applied_now.append(version)
+    return applied_now
+
+def ensure_schema(engine):
+    """Brings the database up to the latest migration, once per process"""
+    global _schema_checked
+    if _schema_checked:
+        return
+
+    migrate(engine)
+    _schema_checked = True
+
+if __name__ == '__main__':
+    applied = migrate()
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date.")
@@ -0,0 +1,71 @@
+# serialize.py
+
+import math
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import orjson
+
+# NaN/Infinity are written as null by orjson itself. Naive datetimes get +00:00, so browsers
+# read them as UTC like the HTTP dates Flask's jsonify used to send; dates stay YYYY-MM-DD.
+JSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value):
+    # Types orjson doesn't know: NUMERIC columns, pandas' missing markers
+    if isinstance(value, Decimal):
+        return None if value.is_nan() else float(value)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(obj):
+    """JSON bytes for any payload of dicts, lists, numbers, strings, dates and NumPy values"""
+    return orjson.dumps(obj, default=_default, option=JSON_OPTIONS)
+
+
+def records_json(columns, rows):
+    """
+    A JSON list of {column: value} objects straight from DB rows (tuples in column order), with
+    no DataFrame in between. columns may be a subset/reordering given as (name, position) pairs.
+    """
+    return dumps([{name: row[i] for name, i in columns} for row in rows])
+
+
+def iter_records_json(columns, row_chunks):
+    """
+    Same output as records_json, yielded chunk by chunk (e.g. from Result.partitions()), so a
+    response can stream a whole table while only one chunk of rows is held in memory
+    """
+    yield b"["
+    first = True
+    for rows in row_chunks:
+        if not rows:
+            continue
+        body = records_json(columns, rows)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+
+def ndjson_lines(columns, rows):
+    """One JSON object per line for a chunk of DB rows"""
+    return b"".join(dumps({name: row[i] for name, i in columns}) + b"\n" for row in rows)
+
+
+def _column_values(series):
+    # Plain Python values per column, converted by NumPy in one pass instead of cell by cell
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return [None if value is pd.NaT else value for value in series.array.to_pydatetime()]
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.to_numpy(dtype=float).tolist()  # NaN stays float and orjson writes null
+    return [None if isinstance(value, float) and math.isnan(value) else value for value in series.tolist()]
+
+
+def frame_records_json(df):
+    """records_json for a DataFrame, built from its column arrays rather than df.to_dict()"""
+    columns = [(str(name), i) for i, name in enumerate(df.columns)]
+    return records_json(columns, zip(*[_column_values(df[name]) for name in df.columns]))
@@ -0,0 +1,49 @@
+# stations.py
+
+import os
+import json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Location used for the model, forecasts and rows that predate multi-station ingestion
+DEFAULT_LOCATION = 'Delhi'
+
+# Each station pairs a WAQI feed id with the Visual Crossing location used for its weather
+DEFAULT_STATIONS = [
+    {
+        "location": DEFAULT_LOCATION,
+        "station": "@10124",
+        "weather_location": "INDIRA GANDHI INTERNATIONAL, IN",
+    },
+]
+
+
+def load_stations():
+    """
+    Returns the station registry. Set STATIONS_FILE to a JSON file (or STATIONS_JSON to a JSON string)
+    containing a list of {"location", "station", "weather_location"} objects to ingest more stations.
+    """
+    stations_file = os.getenv("STATIONS_FILE")
+    stations_json = os.getenv("STATIONS_JSON")
+
+    if stations_file:
+        with open(stations_file) as f:
+            stations = json.load(f)
+    elif stations_json:
+        stations = json.loads(stations_json)
+    else:
+        stations = DEFAULT_STATIONS
+
+    for station in stations:
+        missing = {"location", "station", "weather_location"} - station.keys()
+        if missing:
+            raise ValueError(f"Station entry {station} is missing {sorted(missing)}")
+    return stations
+
+
+def get_station(location=DEFAULT_LOCATION):
+    for station in load_stations():
+        if station["location"] == location:
+            return station
+    raise KeyError(f"Unknown station location '{location}'")
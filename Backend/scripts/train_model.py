@@ -1,29 +1,75 @@
 # train_model.py
 import os
-import joblib
 import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, r2_score, mean_squared_error, mean_absolute_percentage_error
 from xgboost import XGBRegressor
+from scripts.db import get_engine
+from scripts.features import build_feature_matrix, build_targets
+from scripts import response_cache
+from scripts.metrics import timed  # 'metrics' is the evaluation dict in this module
+from scripts.model_registry import get_model, get_model_metadata, model_exists, publish_model, validate_features
+from scripts.stations import DEFAULT_LOCATION
+from scripts.update_database import ensure_schema
+
+# Hyperparameters of the production model; scripts/tuning.py searches around these
+DEFAULT_PARAMS = {
+    "colsample_bytree": 0.9, "gamma": 0, "learning_rate": 0.035, "max_depth": 3,
+    "min_child_weight": 1, "n_estimators": 200, "subsample": 0.7, "random_state": 42,
+    "tree_method": "hist",
+}
+
+# Incremental mode: trees added per update, rows needed before updating, and when to refit from scratch
+INCREMENTAL_ROUNDS = int(os.getenv("INCREMENTAL_ROUNDS", "5"))
+INCREMENTAL_MIN_ROWS = int(os.getenv("INCREMENTAL_MIN_ROWS", "7"))
+FULL_REFIT_DAYS = int(os.getenv("FULL_REFIT_DAYS", "7"))
+DRIFT_TOLERANCE = float(os.getenv("DRIFT_TOLERANCE", "0.25"))
 
 # Load the dataset from PostgreSQL
-def load_data():
-    # Set the database URL (use environment variable or hardcoded URL for local development)
-    DATABASE_URL = os.getenv("DATABASE_URL")
+@timed("load_data")
+def load_data(location=DEFAULT_LOCATION, last_n_days=None, since=None, until=None, columns=None, downcast=False):
+    """
+    Loads cleaned_data for one station in date order.
+
+    last_n_days  only the most recent N daily rows (ORDER BY date DESC LIMIT N in SQL)
+    since/until  inclusive date bounds, e.g. an explicit training window
+    columns      project to these columns ('date' is always included)
+    downcast     return float columns as float32
+    """
+    # Shared pooled engine (DATABASE_URL from environment variables)
+    engine = get_engine()
+    ensure_schema(engine)
 
-    # Create a connection to the PostgreSQL database
-    engine = create_engine(DATABASE_URL)
+    select_list = "*"
+    if columns:
+        wanted = ['date'] + [col for col in columns if col != 'date']
+        select_list = ", ".join('"' + col.replace('"', '""') + '"' for col in wanted)
 
-    # SQL query to fetch the data
-    query = "SELECT * FROM cleaned_data"
-    data = pd.read_sql(query, engine)
+    filters, params = ["location = :location"], {"location": location}
+    if since:
+        filters.append("date >= :since")
+        params["since"] = since
+    if until:
+        filters.append("date <= :until")
+        params["until"] = until
 
-    # Close the connection
-    engine.dispose()
+    # SQL query to fetch the data for a single station
+    query = f"SELECT {select_list} FROM cleaned_data WHERE {' AND '.join(filters)}"
+    if last_n_days:
+        # Take the tail in SQL, then restore chronological order
+        query = f"SELECT * FROM ({query} ORDER BY date DESC LIMIT :limit) AS tail"
+        params["limit"] = int(last_n_days)
+    query += " ORDER BY date"
 
-    data = data.drop(columns=['precip'], errors='ignore')
+    with engine.connect() as conn:
+        data = pd.read_sql(text(query), conn, params=params, parse_dates=['date'])
+
+    data = data.drop(columns=['precip', 'location'], errors='ignore')
+    if downcast:
+        float_cols = data.select_dtypes(include=['float']).columns
+        data[float_cols] = data[float_cols].astype(np.float32)
     return data
 
 # Feature Engineering Function
@@ -49,67 +95,53 @@ def create_lag_features(df, num_lags=7):
     df = df.dropna()  # Drop rows with NaN values (from lagging)
     return df
 
-# Prepare the data for training
-def prepare_data():
-    data = load_data()
-    data = engineer_additional_features(data)
-    
-    data = data.drop(columns=['date'], errors='ignore')
-
-    # Add lag features for AQI (lag for the last 7 days)
-    data = create_lag_features(data)
+# Build the feature matrix and the next-7-day targets, in date order (indexed by date)
+def prepare_features(since=None, until=None, data=None):
+    if data is None:
+        data = load_data(since=since, until=until)
 
-    X = data.drop(columns=['AQI'])
-    y = data[['AQI']]  
+    # Engineered and lag features (lag for the last 7 days) in one float32 matrix
+    features = build_feature_matrix(data)
+    aqi_idx = features.columns.index('AQI')
+    feature_columns = [col for col in features.columns if col != 'AQI']
+    feature_idx = [features.columns.index(col) for col in feature_columns]
 
     # Create target variables for the next F days (e.g., 7 days)
     F = 7
-    y_next_F_days = pd.DataFrame()
-    for i in range(1, (F + 1)):
-        y_next_F_days[f"AQI_day_{i}"] = data['AQI'].shift(-i)
+    targets = build_targets(features.values[:, aqi_idx], F)
+    index = pd.DatetimeIndex(features.dates[:len(targets)], name='date')
+    y_next_F_days = pd.DataFrame(targets, columns=[f"AQI_day_{i}" for i in range(1, (F + 1))], index=index)
 
     # Remove the last F rows since they won't have target data for the next F days
-    X = X.iloc[:-F]
-    y_next_F_days = y_next_F_days.iloc[:-F]
+    X = pd.DataFrame(features.values[:len(targets), feature_idx], columns=feature_columns, index=index)
+    return X, y_next_F_days
+
+# Prepare the data for training
+def prepare_data(since=None, until=None):
+    X, y_next_F_days = prepare_features(since=since, until=until)
 
     # Split the data into training and test sets
     X_train, X_test, y_train, y_test = train_test_split(X, y_next_F_days, test_size=0.2, random_state=42, shuffle=False)
 
     return X_train, X_test, y_train, y_test
 
-# Train the XGBoost model
-def train_model():
-    X_train, X_test, y_train, y_test = prepare_data()
-
-    # XGBoost model
-    xgb_model = XGBRegressor(
-        colsample_bytree=0.9, gamma=0, learning_rate=0.035, max_depth=3, 
-        min_child_weight=1, n_estimators=200, subsample=0.7, random_state=42
-    )
-
-    # Fit the model
-    xgb_model.fit(X_train, y_train)
-
-    # Evaluate the model
-    y_pred = xgb_model.predict(X_test)
-    mae = mean_absolute_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-    mape = mean_absolute_percentage_error(y_test, y_pred)
-
-    print(f"XGBoost - MAE: {mae:.4f}, R²: {r2:.4f}, RMSE: {rmse:.4f}, MAPE: {mape:.4f}")
+def evaluate(y_true, y_pred):
+    return {
+        "mae": round(float(mean_absolute_error(y_true, y_pred)), 4),
+        "r2": round(float(r2_score(y_true, y_pred)), 4),
+        "rmse": round(float(np.sqrt(mean_squared_error(y_true, y_pred))), 4),
+        "mape": round(float(mean_absolute_percentage_error(y_true, y_pred)), 4),
+    }
 
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    engine = create_engine(DATABASE_URL)
+def record_evaluation(metrics):
+    """Upserts today's row in model_evaluation and expires the cached metrics response"""
+    engine = get_engine()
 
     now = pd.Timestamp.now()
 
     metrics_data = {
         "timestamp": now.isoformat(),
-        "mae": round(float(mae), 4),
-        "r2": round(float(r2), 4),
-        "rmse": round(float(rmse), 4),
-        "mape": round(float(mape), 4),
+        **metrics,
         "eval_date": now.date()  # Clean and direct!
     }
 
@@ -127,22 +159,117 @@ def train_model():
             """),
             metrics_data
         )
+    response_cache.invalidate('get_evaluation_metrics')
+    return metrics_data
+
+def continue_training(model, X_new, y_new, params=None, rounds=INCREMENTAL_ROUNDS):
+    """Returns a copy of model with `rounds` more trees boosted on the new rows only"""
+    # A model loaded from its booster file no longer carries the sklearn hyperparameters
+    params = {**DEFAULT_PARAMS, **(params or {}), "n_estimators": rounds}
+    updated = XGBRegressor(**params)
+    updated.fit(X_new, y_new, xgb_model=model.get_booster())
+    return updated
+
+# Train the XGBoost model
+@timed("train_model")
+def train_model(since=None, until=None, params=None):
+    """Fits, evaluates and publishes the model; params overrides DEFAULT_PARAMS (e.g. a tuned config)"""
+    X_train, X_test, y_train, y_test = prepare_data(since=since, until=until)
+
+    # XGBoost model
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    xgb_model = XGBRegressor(**params)
+
+    # Fit the model
+    xgb_model.fit(X_train, y_train)
+
+    # Evaluate the model
+    y_pred = xgb_model.predict(X_test)
+    metrics = evaluate(y_test, y_pred)
+
+    print(f"XGBoost - MAE: {metrics['mae']:.4f}, R²: {metrics['r2']:.4f}, RMSE: {metrics['rmse']:.4f}, MAPE: {metrics['mape']:.4f}")
+
+    metrics_data = record_evaluation(metrics)
 
     # Save the trained model
     # model_path = r'C:\Codes\WebDev\AQI-Forecasting-Webapp\Backend\ML_models\xgboost_model.pkl'
     # Save the trained model to a relative path
     # model_path = os.path.join(os.path.dirname(__file__), 'ML_models', 'xgboost_model.pkl')
 
-    # for render
-    model_path = '/app/data/xgboost_model.pkl'
+    # Save the trained model and swap it into the in-process cache; incremental updates continue from here.
+    # The window ends with the holdout: its rows produced baseline_rmse, so they are neither boosted on
+    # nor drift-checked as new data later
+    metadata = {
+        "mode": "full",
+        "trained_until": X_test.index[-1].date().isoformat(),
+        "full_refit_at": metrics_data["timestamp"],
+        "baseline_rmse": metrics["rmse"],
+        "updates_since_full": 0,
+        "params": params,
+    }
+    metadata["metrics"] = metrics
+    manifest = publish_model(xgb_model, metadata)
+    print(f"XGBoost model saved as version {manifest['version']}")
+    return metrics_data
 
-    # Create the directory if it doesn't exist
-    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+@timed("incremental_train")
+def incremental_train(location=DEFAULT_LOCATION):
+    """
+    Continues boosting the published model on the rows that arrived after its training window
+    (for a full refit, the window includes the holdout it was scored on).
 
-    # Save the trained model
-    joblib.dump(xgb_model, model_path)
-    print(f"XGBoost model saved to {model_path}")
+    Falls back to train_model when there is no model to continue from, when FULL_REFIT_DAYS have
+    passed since the last full refit, or when the model's error on the new rows has drifted more
+    than DRIFT_TOLERANCE above the holdout RMSE of that refit. Returns None when fewer than
+    INCREMENTAL_MIN_ROWS new rows have full 7-day targets yet; they are picked up on a later run.
+    """
+    metadata = get_model_metadata()
+    if not model_exists() or "trained_until" not in metadata:
+        print("No previous training window recorded. Running a full refit...")
+        return train_model()
+
+    full_refit_at = pd.Timestamp(metadata["full_refit_at"])
+    if pd.Timestamp.now() - full_refit_at >= pd.Timedelta(days=FULL_REFIT_DAYS):
+        print(f"Last full refit was {full_refit_at:%Y-%m-%d}. Running the scheduled full refit...")
+        return train_model()
+
+    # Local import: feature_store imports load_data from this module
+    from scripts.feature_store import FEATURE_LOOKBACK_ROWS
+
+    # Enough history before the window for lags and 7-day sums, then everything after it
+    trained_until = pd.Timestamp(metadata["trained_until"])
+    history = load_data(location=location, until=trained_until, last_n_days=FEATURE_LOOKBACK_ROWS)
+    recent = load_data(location=location, since=trained_until + pd.Timedelta(days=1))
+    X, y = prepare_features(data=pd.concat([history, recent], ignore_index=True))
+    X_new, y_new = X[X.index > trained_until], y[y.index > trained_until]
+
+    if len(X_new) < INCREMENTAL_MIN_ROWS:
+        print(f"Only {len(X_new)} new row(s) since {trained_until:%Y-%m-%d}; waiting for {INCREMENTAL_MIN_ROWS}.")
+        return None
+
+    # Rows the model has never seen: its error here is an honest out-of-sample score
+    model = get_model()
+    X_new = X_new[validate_features(model, X_new.columns)]
+    metrics = evaluate(y_new, model.predict(X_new))
+    print(f"Previous model on {len(X_new)} new rows - MAE: {metrics['mae']:.4f}, RMSE: {metrics['rmse']:.4f}")
+
+    if metrics["rmse"] > metadata["baseline_rmse"] * (1 + DRIFT_TOLERANCE):
+        print(f"RMSE drifted above the baseline {metadata['baseline_rmse']:.4f}. Running a full refit...")
+        return train_model()
+
+    metrics_data = record_evaluation(metrics)
+    updated = continue_training(model, X_new, y_new, metadata.get("params"))
+    metadata = {
+        **metadata,
+        "mode": "incremental",
+        "trained_until": X_new.index[-1].date().isoformat(),
+        "updates_since_full": metadata.get("updates_since_full", 0) + 1,
+        "metrics": metrics,
+    }
+    publish_model(updated, metadata)
+    print(f"Model updated with {INCREMENTAL_ROUNDS} rounds on {len(X_new)} rows through {metadata['trained_until']}")
+    return metrics_data
 
 
 if __name__ == '__main__':
-    train_model()
\ No newline at end of file
+    train_model()
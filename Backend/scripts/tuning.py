@@ -0,0 +1,245 @@
+# tuning.py
+
+import os
+import json
+import time
+import uuid
+import random
+import itertools
+import multiprocessing
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import text
+from scripts.db import get_engine
+from scripts.model_registry import get_model, get_model_metadata, model_exists
+from scripts.train_model import DEFAULT_PARAMS, evaluate, prepare_features, train_model
+from scripts.update_database import ensure_schema
+
+# Search settings, tunable per deployment
+TUNE_WORKERS = int(os.getenv("TUNE_WORKERS", str(os.cpu_count() or 1)))
+TUNE_THREADS_PER_WORKER = int(os.getenv("TUNE_THREADS_PER_WORKER", str(max(1, (os.cpu_count() or 1) // TUNE_WORKERS))))
+TUNE_TRIALS = int(os.getenv("TUNE_TRIALS", "20"))  # 0 runs the whole grid
+TUNE_FOLDS = int(os.getenv("TUNE_FOLDS", "4"))
+TUNE_MAX_BIN = int(os.getenv("TUNE_MAX_BIN", "256"))
+TUNE_SEED = int(os.getenv("TUNE_SEED", "42"))
+# Relative RMSE improvement a candidate needs over the current config before it is promoted
+TUNE_MIN_IMPROVEMENT = float(os.getenv("TUNE_MIN_IMPROVEMENT", "0.0"))
+
+# Rows of future AQI in each target; training rows this close to a validation block are purged
+HORIZON = 7
+
+TUNE_GRID = {
+    "learning_rate": [0.02, 0.035, 0.05, 0.1],
+    "max_depth": [3, 4, 5, 6],
+    "min_child_weight": [1, 3, 5],
+    "subsample": [0.7, 0.85, 1.0],
+    "colsample_bytree": [0.7, 0.9, 1.0],
+    "gamma": [0, 1],
+    "n_estimators": [200, 400],
+}
+
+# Quantized fold matrices, built once per worker process and reused for every config it evaluates
+_folds = None
+
+
+def walk_forward_folds(n_rows, n_folds=TUNE_FOLDS, horizon=HORIZON, min_train_fraction=0.5):
+    """
+    Expanding-window folds over date-ordered rows as (train_end, val_start, val_end).
+    Each fold trains on everything before its validation block, minus the `horizon` rows whose
+    targets would reach into it, so no fold sees the AQI it is scored on.
+    """
+    first_val = int(n_rows * min_train_fraction)
+    block = (n_rows - first_val) // n_folds
+    if block < 1 or first_val - horizon < 1:
+        raise ValueError(f"Not enough rows ({n_rows}) for {n_folds} walk-forward folds.")
+
+    folds = []
+    for k in range(n_folds):
+        val_start = first_val + k * block
+        val_end = n_rows if k == n_folds - 1 else val_start + block
+        folds.append((val_start - horizon, val_start, val_end))
+    return folds
+
+
+def sample_configs(trials=TUNE_TRIALS, seed=TUNE_SEED):
+    """Random sample of the grid (the whole grid when trials is 0 or covers it)"""
+    keys = list(TUNE_GRID)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(TUNE_GRID[key] for key in keys))]
+    if trials and trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    return grid
+
+
+def current_params():
+    """Hyperparameters of the deployed model, or DEFAULT_PARAMS when none is published yet"""
+    params = {key: DEFAULT_PARAMS[key] for key in TUNE_GRID}
+    if model_exists():
+        # Prefer the params recorded in the manifest; only legacy pickles still carry them on the model
+        deployed = get_model_metadata().get("params") or get_model().get_params()
+        params.update({key: deployed[key] for key in TUNE_GRID if deployed.get(key) is not None})
+    return params
+
+
+def _init_worker(X, y, folds, max_bin, nthread):
+    global _folds
+    _folds = []
+    for train_end, val_start, val_end in folds:
+        dtrain = xgb.QuantileDMatrix(X[:train_end], y[:train_end], max_bin=max_bin, nthread=nthread)
+        # Validation rows are binned with the training cuts, so they are never re-quantized per config
+        dval = xgb.QuantileDMatrix(X[val_start:val_end], y[val_start:val_end], ref=dtrain, nthread=nthread)
+        _folds.append((dtrain, dval, y[val_start:val_end]))
+
+
+def _booster_params(params, nthread):
+    # XGBRegressor names mapped onto xgb.train; n_estimators becomes the number of rounds
+    native = {key: value for key, value in params.items() if key != "n_estimators"}
+    native.update({
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "max_bin": TUNE_MAX_BIN,
+        "nthread": nthread,
+        "seed": DEFAULT_PARAMS["random_state"],
+    })
+    return native, params["n_estimators"]
+
+
+def _evaluate_config(config_id, params, nthread):
+    """Trains and scores one config on every fold of this worker; returns one result per fold"""
+    native, rounds = _booster_params(params, nthread)
+    results = []
+    for fold, (dtrain, dval, y_val) in enumerate(_folds):
+        start = time.perf_counter()
+        booster = xgb.train(native, dtrain, num_boost_round=rounds)
+        y_pred = booster.predict(dval)
+        elapsed = time.perf_counter() - start
+
+        results.append({
+            "config_id": config_id,
+            "fold": fold,
+            "train_rows": dtrain.num_row(),
+            "val_rows": dval.num_row(),
+            "fit_seconds": round(elapsed, 4),
+            **evaluate(y_val, y_pred),
+        })
+    return results
+
+
+def _summarize(fold_results):
+    # Mean over folds; the spread of RMSE across folds is the stability of the estimate
+    frame = pd.DataFrame(fold_results)
+    return {
+        "fold": None,
+        "train_rows": int(frame["train_rows"].sum()),
+        "val_rows": int(frame["val_rows"].sum()),
+        "fit_seconds": round(float(frame["fit_seconds"].sum()), 4),
+        "mae": round(float(frame["mae"].mean()), 4),
+        "r2": round(float(frame["r2"].mean()), 4),
+        "rmse": round(float(frame["rmse"].mean()), 4),
+        "rmse_std": round(float(frame["rmse"].std(ddof=0)), 4),
+        "mape": round(float(frame["mape"].mean()), 4),
+    }
+
+
+def _record_results(run_id, timestamp, configs, fold_results, summaries, current_id, promoted_id):
+    rows = []
+    for config_id, params in enumerate(configs):
+        flags = {
+            "run_id": run_id,
+            "timestamp": timestamp,
+            "config_id": config_id,
+            "params": json.dumps(params, sort_keys=True),
+            "is_current": config_id == current_id,
+            "promoted": config_id == promoted_id,
+        }
+        for result in fold_results[config_id]:
+            rows.append({**flags, "rmse_std": None, **result})
+        rows.append({**flags, **summaries[config_id]})
+
+    engine = get_engine()
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO model_tuning_results (
+                    run_id, timestamp, config_id, fold, params, is_current, promoted,
+                    train_rows, val_rows, fit_seconds, mae, r2, rmse, rmse_std, mape
+                )
+                VALUES (
+                    :run_id, :timestamp, :config_id, :fold, :params, :is_current, :promoted,
+                    :train_rows, :val_rows, :fit_seconds, :mae, :r2, :rmse, :rmse_std, :mape
+                )
+            """),
+            rows
+        )
+
+
+def tune_model(since=None, until=None, trials=TUNE_TRIALS, workers=TUNE_WORKERS):
+    """
+    Walk-forward hyperparameter search. Every sampled config, plus the config of the deployed
+    model, is scored on the same folds across a process pool. The best config is promoted only
+    if its mean RMSE beats the current one; the model is then refit with the chosen config
+    through train_model, which records the holdout metrics in model_evaluation.
+    """
+    run_id = uuid.uuid4().hex[:12]
+    timestamp = pd.Timestamp.now()
+    start = time.perf_counter()
+
+    X, y = prepare_features(since=since, until=until)
+    X = np.ascontiguousarray(X.to_numpy(dtype=np.float32))
+    y = np.ascontiguousarray(y.to_numpy(dtype=np.float32))
+    folds = walk_forward_folds(len(X))
+
+    current = current_params()
+    configs = [current] + [params for params in sample_configs(trials) if params != current]
+    current_id = 0
+
+    nthread = TUNE_THREADS_PER_WORKER
+    workers = max(1, min(workers, len(configs)))
+    print(f"Tuning run {run_id}: {len(configs)} configs x {len(folds)} folds on {workers} workers ({nthread} threads each)")
+
+    # spawn: the parent may hold pooled DB connections and job-queue threads that must not be forked
+    fold_results = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(X, y, folds, TUNE_MAX_BIN, nthread),
+    ) as pool:
+        futures = {
+            pool.submit(_evaluate_config, config_id, params, nthread): config_id
+            for config_id, params in enumerate(configs)
+        }
+        for future in as_completed(futures):
+            fold_results[futures[future]] = future.result()
+
+    summaries = {config_id: _summarize(results) for config_id, results in fold_results.items()}
+    best_id = min(summaries, key=lambda config_id: summaries[config_id]["rmse"])
+    best_rmse, current_rmse = summaries[best_id]["rmse"], summaries[current_id]["rmse"]
+
+    improved = best_id != current_id and best_rmse < current_rmse * (1 - TUNE_MIN_IMPROVEMENT)
+    promoted_id = best_id if improved or not model_exists() else current_id
+    _record_results(run_id, timestamp, configs, fold_results, summaries, current_id, promoted_id)
+
+    elapsed = time.perf_counter() - start
+    print(f"Tuning run {run_id} finished in {elapsed:.1f}s. "
+          f"Best RMSE {best_rmse:.4f} ± {summaries[best_id]['rmse_std']:.4f}, current {current_rmse:.4f}.")
+    if promoted_id == current_id:
+        print("No config beat the current one; refitting with the current hyperparameters.")
+    else:
+        print(f"Promoting config {promoted_id}: {configs[promoted_id]}")
+
+    metrics = train_model(since=since, until=until, params=configs[promoted_id])
+    return {
+        "run_id": run_id,
+        "promoted": promoted_id != current_id,
+        "params": configs[promoted_id],
+        "cv": summaries[promoted_id],
+        "holdout": metrics,
+        "seconds": round(elapsed, 2),
+    }
+
+
+if __name__ == '__main__':
+    print(tune_model())
@@ -4,128 +4,197 @@ from typing import List
 from datetime import datetime
 from zoneinfo import ZoneInfo # for timezone handling
 from sqlalchemy import create_engine, text
+from scripts.db import get_engine
+from scripts import metrics, response_cache
 from scripts.preprocess import preprocess_weather_data, preprocess_pollutant_data
+from scripts.stations import DEFAULT_LOCATION
 from dotenv import load_dotenv
-
-def delete_existing_entries(conn, date_str: str, tables: List[str]):
-    for table in tables:
-        conn.execute(
-            text(f"DELETE FROM {table} WHERE date = :date_str"),
-            {"date_str": date_str}
-        )
+# Table and column definitions live in scripts/schema.py; re-exported here for existing imports
+from scripts.schema import (  # noqa: F401
+    DATA_TABLES, WEATHER_NUMERIC_COLUMNS, WEATHER_TEXT_COLUMNS, POLLUTANT_NUMERIC_COLUMNS, POLLUTANT_TEXT_COLUMNS,
+    CLEANED_FEATURES, AGGREGATE_TABLES, _quote, ensure_schema
+)
+
+# Stored with every forecast row
+FORECAST_MODEL_NAME = 'XGBoost_V1'
+# Backfilled rows are tagged '<FORECAST_MODEL_NAME>:backfill:<model version>'. They come from a model
+# trained on the very days they predict, so they never replace live forecasts and are not scored
+BACKFILL_MODEL_PATTERN = '%:backfill:%'
+
+
+def backfill_model_name(model_version):
+    return f"{FORECAST_MODEL_NAME}:backfill:{model_version}"
+
+def _records(df: pd.DataFrame):
+    # Plain Python values with NaN mapped to NULL, ready to be bound as parameters
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+def _values_clause(rows: List[dict], columns: List[str], prefix: str):
+    """Builds one multi-row VALUES list so a whole batch is sent in a single statement"""
+    tuples, params = [], {}
+    for i, row in enumerate(rows):
+        names = []
+        for j, col in enumerate(columns):
+            params[f"{prefix}{i}_{j}"] = row[col]
+            names.append(f":{prefix}{i}_{j}")
+        tuples.append(f"({', '.join(names)})")
+    return ",\n".join(tuples), params
+
+def _key_filter(keys: List[dict], alias: str):
+    """WHERE clause matching the batch's (location, date) pairs, with bare parameters typed by the column"""
+    clauses, params = [], {}
+    for i, key in enumerate(keys):
+        clauses.append(f"({alias}.location = :key_loc_{i} AND {alias}.date = :key_date_{i})")
+        params[f"key_loc_{i}"] = key["location"]
+        params[f"key_date_{i}"] = key["date"]
+    return " OR ".join(clauses), params
+
+def summarize_batch(df: pd.DataFrame, numeric_cols: List[str], text_cols: List[str]):
+    """Reduces a batch of readings to per-(location, date) sums, counts and first text values"""
+    numeric_cols = [col for col in numeric_cols if col in df.columns]
+    text_cols = [col for col in text_cols if col in df.columns]
+    grouped = df.groupby(["location", "date"])
+
+    summary = pd.concat(
+        [grouped[numeric_cols].sum().add_suffix('_sum'),
+         grouped[numeric_cols].count().add_suffix('_n'),
+         grouped[text_cols].first()],
+        axis=1
+    ).reset_index()
+    return summary, numeric_cols, text_cols
+
+def upsert_running_aggregate(conn, agg_table: str, summary: pd.DataFrame, numeric_cols: List[str], text_cols: List[str]):
+    columns = ["location", "date"] + [f"{col}_sum" for col in numeric_cols] \
+        + [f"{col}_n" for col in numeric_cols] + text_cols
+    values, params = _values_clause(_records(summary), columns, "v")
+
+    updates = [f"{_quote(col)} = {agg_table}.{_quote(col)} + EXCLUDED.{_quote(col)}"
+               for col in columns[2:2 + 2 * len(numeric_cols)]]
+    # Text columns keep the first value seen for the day, like the old groupby().first()
+    updates += [f"{_quote(col)} = COALESCE({agg_table}.{_quote(col)}, EXCLUDED.{_quote(col)})" for col in text_cols]
+
+    conn.execute(text(f"""
+        INSERT INTO {agg_table} ({", ".join(_quote(col) for col in columns)})
+        VALUES {values}
+        ON CONFLICT (location, date) DO UPDATE SET {", ".join(updates)}
+    """), params)
+
+def _average_columns(numeric_cols: List[str], text_cols: List[str]):
+    """(column, SQL expression) pairs that turn an aggregate row back into averaged values"""
+    return [(col, f"{_quote(col + '_sum')} / NULLIF({_quote(col + '_n')}, 0)") for col in numeric_cols] \
+        + [(col, _quote(col)) for col in text_cols]
+
+def _materialize(conn, table: str, select_columns: List[str], source_sql: str, keys: List[dict], alias: str):
+    """Upserts the rows for the batch's keys into table from a SELECT over already-stored data"""
+    target_columns = ["location", "date"] + [col for col, _ in select_columns]
+    select_list = [f"{alias}.location", f"{alias}.date"] + [expr for _, expr in select_columns]
+    where, params = _key_filter(keys, alias)
+    updates = [f"{_quote(col)} = EXCLUDED.{_quote(col)}" for col in target_columns[2:]]
+
+    conn.execute(text(f"""
+        INSERT INTO {table} ({", ".join(_quote(col) for col in target_columns)})
+        SELECT {", ".join(select_list)}
+        FROM {source_sql}
+        WHERE {where}
+        ON CONFLICT (location, date) DO UPDATE SET {", ".join(updates)}
+    """), params)
 
 # Function to update the database with new weather and pollutant data
+@metrics.timed("update_database")
 def update_database(weather_df: pd.DataFrame, pollutant_df: pd.DataFrame):
-    # Connect to PostgreSQL (use DATABASE_URL from environment variables)
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    engine = create_engine(DATABASE_URL)
-    conn = engine.connect()
-
-    # 1. Preprocess new data
+    """
+    Folds a batch of weather and pollutant readings, for one or many stations, into the
+    running (location, date) aggregates and refreshes the averaged rows in all 4 tables.
+
+    Everything happens SQL-side in one transaction with a fixed number of statements
+    (two aggregate upserts plus four materializations), whatever the batch or history size.
+    Returns the {"location", "date"} keys that were written; raises if the transaction failed.
+    """
+    # Shared pooled engine (DATABASE_URL from environment variables)
+    engine = get_engine()
+    ensure_schema(engine)
+
+    # 1. Preprocess new data (frames without a location column come from the default station)
+    if 'location' not in weather_df.columns:
+        weather_df = weather_df.assign(location=DEFAULT_LOCATION)
+    if 'location' not in pollutant_df.columns:
+        pollutant_df = pollutant_df.assign(location=DEFAULT_LOCATION)
     weather_df = preprocess_weather_data(weather_df)
     pollutant_df = preprocess_pollutant_data(pollutant_df)
 
-    # Ensure consistent date format
-    weather_df['date'] = pd.to_datetime(weather_df['date'])
-    pollutant_df['date'] = pd.to_datetime(pollutant_df['date'])
-
-    # 2. Get the latest date (assumes all rows are for the same date)
-    latest_date = weather_df['date'].max()
-    latest_date_str = latest_date.strftime('%Y-%m-%d')  # Convert to string format
-
-    # 3. Load existing data for that date
-    existing_weather = pd.read_sql_query(
-        "SELECT * FROM weather_data WHERE date = %s", conn, params=(latest_date_str,)
-    )
-    print("Existing weather data loaded:", existing_weather.shape)
-    print("data:", weather_df)
-    existing_pollutant = pd.read_sql_query(
-        "SELECT * FROM pollutant_data WHERE date = %s", conn, params=(latest_date_str,)
-    )
-
-    # Ensure consistent date format in existing data
-    existing_weather['date'] = pd.to_datetime(existing_weather['date'])
-    existing_pollutant['date'] = pd.to_datetime(existing_pollutant['date'])
-
-    # 4. Combine with new data
-    if not existing_weather.empty:
-        print("Existing weather data found. Appending new data.")
-        full_weather = pd.concat([existing_weather, weather_df], ignore_index=True)
-        full_weather = full_weather.dropna(axis=1, how='all')  # Remove all-NA columns
-    else:
-        full_weather = weather_df.copy()
-
-    if not existing_pollutant.empty:
-        print("Existing pollutant data found. Appending new data.")
-        full_pollutant = pd.concat([existing_pollutant, pollutant_df], ignore_index=True)
-    else:
-        full_pollutant = pollutant_df.copy()
-
-    # 5. Perform numeric aggregation and merge
-    numeric_cols_weather = full_weather.select_dtypes(include=['number']).columns
-    non_numeric_cols_weather = full_weather.select_dtypes(exclude=['number']).columns
-
-    numeric_cols_pollutant = full_pollutant.select_dtypes(include=['number']).columns
-    non_numeric_cols_pollutant = full_pollutant.select_dtypes(exclude=['number']).columns
-
-    # Perform numeric aggregation
-    avg_weather_numeric = full_weather.groupby("date", as_index=False)[
-        [col for col in numeric_cols_weather if col != "date"]
-    ].mean()
-
-    avg_pollutant_numeric = full_pollutant.groupby("date", as_index=False)[
-        [col for col in numeric_cols_pollutant if col != "date"]
-    ].mean()
-
-    avg_weather_non_numeric = full_weather.groupby("date", as_index=False)[non_numeric_cols_weather].first()
-    avg_pollutant_non_numeric = full_pollutant.groupby("date", as_index=False)[non_numeric_cols_pollutant].first()
-
-    # Merge numeric and non-numeric columns
-    avg_weather = pd.merge(avg_weather_numeric, avg_weather_non_numeric, on="date", how="inner")
-    avg_pollutant = pd.merge(avg_pollutant_numeric, avg_pollutant_non_numeric, on="date", how="inner")
-
-    # 6. Merge to form RawData and CleanData
-    avg_raw = pd.merge(avg_weather, avg_pollutant, on="date", how="inner")
-    avg_raw = avg_raw.drop_duplicates(subset='date')  # Remove duplicate dates
-
-    cleaned_features = [
-        "date", "pm25", "pm10", "co", "no2", "so2", "o3", "AQI",
-        "tempmax", "tempmin", "temp", "humidity", "dew",
-        "windspeed", "winddir", "windgust", "precip", "cloudcover",
-        "visibility", "sealevelpressure"
-    ]
-    existing_features = list(set(cleaned_features).intersection(avg_raw.columns))
-    avg_clean = avg_raw[existing_features].copy()
-
-    # Convert date columns to string format
-    for df in [avg_weather, avg_pollutant, avg_raw, avg_clean]:
-        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    # 2. Keep only the latest date per station (each station's newest day is the one being refreshed)
+    latest_dates = weather_df.groupby('location', as_index=False)['date'].max()
+    weather_df = weather_df.merge(latest_dates, on=['location', 'date'], how='inner')
+    pollutant_df = pollutant_df.merge(latest_dates, on=['location', 'date'], how='inner')
+    keys = latest_dates.to_dict(orient='records')
 
-    # 7. Delete existing entries for the date
-    try:
-        delete_existing_entries(conn, latest_date_str, ['weather_data', 'pollutant_data', 'raw_data', 'cleaned_data'])
+    # 3. Reduce the batch to sums and counts per (location, date)
+    weather_summary = summarize_batch(weather_df, WEATHER_NUMERIC_COLUMNS, WEATHER_TEXT_COLUMNS)
+    pollutant_summary = summarize_batch(pollutant_df, POLLUTANT_NUMERIC_COLUMNS, POLLUTANT_TEXT_COLUMNS)
 
-        # Insert new data into the tables
-        avg_weather.to_sql('weather_data', conn, if_exists='append', index=False)
-        avg_pollutant.to_sql('pollutant_data', conn, if_exists='append', index=False)
-        avg_raw.to_sql('raw_data', conn, if_exists='append', index=False)
-        avg_clean.to_sql('cleaned_data', conn, if_exists='append', index=False)
+    weather_columns = _average_columns(*weather_summary[1:])
+    pollutant_columns = _average_columns(*pollutant_summary[1:])
+    raw_columns = [(col, f"w.{_quote(col)}") for col, _ in weather_columns] \
+        + [(col, f"p.{_quote(col)}") for col, _ in pollutant_columns]
+    cleaned_columns = [(col, expr) for col, expr in raw_columns if col in CLEANED_FEATURES]
 
-        conn.commit()
-        print(f"Averaged data stored for {latest_date_str} in all 4 tables.")
+    try:
+        with engine.begin() as conn:
+            # 4. Fold the new readings into the running aggregates
+            upsert_running_aggregate(conn, 'weather_data_agg', *weather_summary)
+            upsert_running_aggregate(conn, 'pollutant_data_agg', *pollutant_summary)
+
+            # 5. Materialize the averaged rows, then the merged raw and cleaned rows derived from them
+            _materialize(conn, 'weather_data', weather_columns, "weather_data_agg a", keys, "a")
+            _materialize(conn, 'pollutant_data', pollutant_columns, "pollutant_data_agg a", keys, "a")
+            join_sql = "weather_data w JOIN pollutant_data p ON p.location = w.location AND p.date = w.date"
+            _materialize(conn, 'raw_data', raw_columns, join_sql, keys, "w")
+            _materialize(conn, 'cleaned_data', cleaned_columns, join_sql, keys, "w")
     except Exception as e:
-        conn.rollback()
+        # Rolled back; the caller (and the job running it) must fail rather than carry on with nothing written
         print(f"Database update failed: {e}")
-    finally:
-        conn.close()
+        raise
+
+    # A station that lagged into an earlier month changes a month the export cache may hold
+    from scripts.export import invalidate_export_cache  # pyarrow stays out of the web workers' startup
+    for table in DATA_TABLES:
+        invalidate_export_cache(table, [key["date"] for key in keys])
+
+    print(f"Averaged data stored for {len(keys)} station(s) in all 4 tables.")
+    return keys
+
+def upsert_aqi_forecasts(forecast_rows: List[dict], backfill: bool = False):
+    """
+    Bulk upsert of forecast rows (forecast_date, predicted_date, predicted_aqi, model_name, location)
+    as one executemany in a single transaction. With backfill=True an existing row is only
+    replaced if it is itself a backfill, so the forecasts the hourly job issued are kept.
+    """
+    if not forecast_rows:
+        return
+    engine = get_engine()
 
-def append_aqi_forecast_to_db(forecast):
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    engine = create_engine(DATABASE_URL)
+    # Use SQLAlchemy-safe text query with named parameters
+    upsert_query = text(f"""
+        INSERT INTO aqi_forecast (forecast_date, predicted_date, predicted_aqi, model_name, location)
+        VALUES (:forecast_date, :predicted_date, :predicted_aqi, :model_name, :location)
+        ON CONFLICT(forecast_date, predicted_date, location) DO UPDATE SET
+            predicted_aqi = EXCLUDED.predicted_aqi,
+            model_name = EXCLUDED.model_name
+        {"WHERE aqi_forecast.model_name LIKE :backfill_pattern" if backfill else ""};
+    """)
+    if backfill:
+        forecast_rows = [{**row, "backfill_pattern": BACKFILL_MODEL_PATTERN} for row in forecast_rows]
 
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(upsert_query, forecast_rows)
+    response_cache.invalidate('get_forecast')
+
+    from scripts.export import invalidate_export_cache  # pyarrow stays out of the web workers' startup
+    invalidate_export_cache('aqi_forecast', [row['forecast_date'] for row in forecast_rows])
+
+def append_aqi_forecast_to_db(forecast, location=DEFAULT_LOCATION):
     forecast_date = datetime.now(ZoneInfo("Asia/Kolkata")).strftime('%Y-%m-%d') # IST timezone
-    model_name = 'XGBoost_V1'
-    location = 'Delhi'
 
     # Create a list of dictionaries to pass to execute()
     forecast_data = [
@@ -133,26 +202,14 @@ def append_aqi_forecast_to_db(forecast):
             'forecast_date': forecast_date,
             'predicted_date': predicted_date,
             'predicted_aqi': predicted_aqi,
-            'model_name': model_name,
+            'model_name': FORECAST_MODEL_NAME,
             'location': location
         }
         for predicted_date, predicted_aqi in forecast.items()
     ]
+    upsert_aqi_forecasts(forecast_data)
 
-    # Use SQLAlchemy-safe text query with named parameters
-    upsert_query = text("""
-        INSERT INTO aqi_forecast (forecast_date, predicted_date, predicted_aqi, model_name, location)
-        VALUES (:forecast_date, :predicted_date, :predicted_aqi, :model_name, :location)
-        ON CONFLICT(forecast_date, predicted_date) DO UPDATE SET
-            predicted_aqi = EXCLUDED.predicted_aqi,
-            model_name = EXCLUDED.model_name,
-            location = EXCLUDED.location;
-    """)
-
-    with engine.begin() as conn:
-        conn.execute(upsert_query, forecast_data)
-
-    print(f"Forecasts for {forecast_date} inserted successfully.")
+    print(f"Forecasts for {location} on {forecast_date} inserted successfully.")
 
 def load_and_merge_data_from_csv(save_to_sqlite=True, save_to_postgres=True):
     load_dotenv()
@@ -162,39 +219,28 @@ def load_and_merge_data_from_csv(save_to_sqlite=True, save_to_postgres=True):
     weather_csv_path = os.path.join(datasets_folder, 'weather_data.csv')
     pollutant_csv_path = os.path.join(datasets_folder, 'pollutant_data.csv')
 
-    # Load CSVs
-    print("Loading weather and pollutant data from CSV...")
-    weather_df = pd.read_csv(weather_csv_path)
-    weather_df['date'] = pd.to_datetime(weather_df['date'], errors='coerce')
-
-    pollutant_df = pd.read_csv(pollutant_csv_path)
-    pollutant_df['date'] = pd.to_datetime(pollutant_df['date'], errors='coerce')
+    if save_to_postgres:
+        # Streamed in chunks through COPY, so the CSVs are never held in memory for Postgres
+        from scripts.bulk_load import bulk_load_csv
+        print("Saving to PostgreSQL...")
+        bulk_load_csv(weather_csv_path, pollutant_csv_path)
 
-    # Merge
-    print("Merging datasets...")
-    merged_df = pd.merge(weather_df, pollutant_df, on='date', how='inner')
+    if save_to_sqlite:
+        # Load CSVs
+        print("Loading weather and pollutant data from CSV...")
+        weather_df = pd.read_csv(weather_csv_path)
+        weather_df['date'] = pd.to_datetime(weather_df['date'], errors='coerce')
 
-    # Clean and extract
-    cleaned_features = [
-        "date", "pm25", "pm10", "co", "no2", "so2", "o3", "AQI",
-        "tempmax", "tempmin", "temp", "humidity", "dew",
-        "windspeed", "winddir", "windgust", "precip", "cloudcover",
-        "visibility", "sealevelpressure"
-    ]
-    cleaned_df = merged_df[cleaned_features].copy()
+        pollutant_df = pd.read_csv(pollutant_csv_path)
+        pollutant_df['date'] = pd.to_datetime(pollutant_df['date'], errors='coerce')
 
-    if save_to_postgres:
-        print("Saving to PostgreSQL...")
-        DATABASE_URL = os.getenv("DATABASE_URL")
-        pg_engine = create_engine(DATABASE_URL)
+        # Merge
+        print("Merging datasets...")
+        merged_df = pd.merge(weather_df, pollutant_df, on='date', how='inner')
 
-        with pg_engine.begin() as conn:
-            weather_df.to_sql('weather_data', conn, if_exists='replace', index=False)
-            pollutant_df.to_sql('pollutant_data', conn, if_exists='replace', index=False)
-            merged_df.to_sql('raw_data', conn, if_exists='replace', index=False)
-            cleaned_df.to_sql('cleaned_data', conn, if_exists='replace', index=False)
+        # Clean and extract
+        cleaned_df = merged_df[CLEANED_FEATURES].copy()
 
-    if save_to_sqlite:
         print("Saving to SQLite...")
         sqlite_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'aqi_forecast.db')
         sqlite_engine = create_engine(f'sqlite:///{sqlite_path}')
@@ -0,0 +1,65 @@
+# test_features.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.features import build_feature_matrix, build_targets
+from scripts.train_model import create_lag_features, engineer_additional_features
+
+CLEANED_COLUMNS = [
+    "pm25", "pm10", "co", "no2", "so2", "o3", "AQI", "tempmax", "tempmin", "temp", "humidity", "dew",
+    "windspeed", "winddir", "windgust", "cloudcover", "visibility", "sealevelpressure"
+]
+
+
+def _history(days, seed=0, gaps=True):
+    """cleaned_data-shaped frame as load_data returns it, with scattered NaNs (AQI included) for dropna"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({col: rng.gamma(2.0, 40.0, days) for col in CLEANED_COLUMNS})
+    df.insert(0, "date", pd.date_range("2020-11-15", periods=days, freq="D"))
+    if gaps:
+        for col in ["windgust", "AQI", "pm25"]:
+            df.loc[rng.choice(days, size=max(1, days // 50), replace=False), col] = np.nan
+    return df
+
+
+def _pandas_path(df):
+    return create_lag_features(engineer_additional_features(df.copy()))
+
+
+@pytest.mark.parametrize("days,gaps", [(400, True), (400, False), (30, True), (10, False), (5, False)])
+def test_build_feature_matrix_matches_pandas_path(days, gaps):
+    df = _history(days, seed=days, gaps=gaps)
+    expected = _pandas_path(df)
+    features = build_feature_matrix(df, dtype=np.float64)
+
+    assert features.columns == [col for col in expected.columns if col != "date"]
+    np.testing.assert_array_equal(features.dates, expected["date"].to_numpy())
+    np.testing.assert_allclose(
+        features.values, expected.drop(columns=["date"]).to_numpy(dtype=np.float64), rtol=1e-12
+    )
+
+
+def test_build_feature_matrix_leaves_input_untouched():
+    df = _history(60)
+    before = df.copy()
+    build_feature_matrix(df)
+    pd.testing.assert_frame_equal(df, before)
+
+
+def test_build_feature_matrix_float32_default():
+    df = _history(120)
+    features = build_feature_matrix(df)
+    assert features.values.dtype == np.float32 and features.values.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(
+        features.values, _pandas_path(df).drop(columns=["date"]).to_numpy(dtype=np.float64), rtol=1e-5
+    )
+
+
+def test_build_targets_are_the_next_days():
+    aqi = np.arange(20, dtype=float)
+    targets = build_targets(aqi, 7)
+    assert targets.shape == (13, 7)
+    np.testing.assert_array_equal(targets[0], aqi[1:8])
+    np.testing.assert_array_equal(targets[-1], aqi[13:20])
+    assert build_targets(aqi[:7], 7).shape == (0, 7)
@@ -0,0 +1,63 @@
+# test_fetch_data.py
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from scripts import fetch_data
+
+
+class StubTransport(BaseAdapter):
+    """Answers every request with one status, or raises one error, without touching the network"""
+
+    def __init__(self, status=200, error=None):
+        super().__init__()
+        self.status = status
+        self.error = error
+
+    def send(self, request, **kwargs):
+        if self.error is not None:
+            raise self.error(f"Failed to reach {request.url}")
+        response = requests.Response()
+        response.status_code = self.status
+        response.url = request.url
+        response.request = request
+        response._content = b'{}'
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def transport():
+    def install(**kwargs):
+        fetch_data.set_transport(StubTransport(**kwargs))
+    yield install
+    fetch_data.set_transport(fetch_data.build_transport())
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"status": 400},
+    {"status": 503},
+    {"error": requests.exceptions.ConnectionError},
+    {"error": requests.exceptions.RetryError},
+])
+def test_upstream_errors_never_include_the_api_key(transport, monkeypatch, kwargs):
+    monkeypatch.setenv("WEATHER_KEY", "SECRETKEY123")
+    monkeypatch.setenv("POLLUTANT_KEY", "SECRETTOKEN")
+    transport(**kwargs)
+
+    with pytest.raises(fetch_data.UpstreamError) as weather_error:
+        fetch_data.fetch_weather("Delhi", "2024-01-01", "2024-01-02")
+    with pytest.raises(fetch_data.UpstreamError) as pollutant_error:
+        fetch_data.fetch_pollutant("@10124")
+
+    for error in (weather_error, pollutant_error):
+        message = str(error.value)
+        assert "SECRET" not in message and "?" not in message
+        assert error.value.__cause__ is None
+
+
+def test_successful_call_returns_the_json_body(transport):
+    transport(status=200)
+    assert fetch_data.fetch_pollutant("@10124") == {}
@@ -0,0 +1,23 @@
+# test_import_time.py
+
+import os
+import sys
+import json
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded lazily by the routes that use them, or in gunicorn's preload; never by 'import app' itself
+HEAVY_PACKAGES = ["xgboost", "sklearn", "scipy", "joblib"]
+
+
+def test_importing_app_leaves_the_ml_stack_unloaded():
+    # A fresh interpreter, since this test session may already have imported them
+    code = (
+        "import sys, json, app; "
+        f"print(json.dumps([name for name in {HEAVY_PACKAGES!r} if name in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,60 @@
+# test_preprocess.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.preprocess import POLLUTANT_BREAKPOINTS, calculate_aqi, calculate_aqi_array, calculate_aqi_batch
+
+
+def _edge_values(breakpoints):
+    # Every bound, just inside and outside it, and the gaps between ranges (e.g. pm25 30.5, co 1.05)
+    values = []
+    for c_lo, c_hi, _, _ in breakpoints:
+        values += [c_lo, c_hi, c_lo - 0.01, c_lo + 0.01, c_hi - 0.01, c_hi + 0.01, (c_lo + c_hi) / 2]
+    for (_, prev_hi, _, _), (next_lo, _, _, _) in zip(breakpoints, breakpoints[1:]):
+        values.append((prev_hi + next_lo) / 2)
+    return values
+
+
+def _test_values(pollutant):
+    breakpoints = POLLUTANT_BREAKPOINTS[pollutant]
+    rng = np.random.default_rng(sum(map(ord, pollutant)))
+    top = breakpoints[-1][1]
+    random_values = np.concatenate([rng.uniform(0, top * 1.2, 2000), rng.integers(0, int(top * 1.2), 500)])
+    special = [np.nan, -1.0, -0.01, top * 10, np.inf, -np.inf]
+    return np.concatenate([random_values, _edge_values(breakpoints), special]).astype(float)
+
+
+def _expected(values, pollutant, scale):
+    results = [calculate_aqi(value, POLLUTANT_BREAKPOINTS[pollutant], scale=scale) for value in values]
+    return np.array([np.nan if result is None else result for result in results], dtype=float)
+
+
+@pytest.mark.parametrize("scale", [False, True])
+@pytest.mark.parametrize("pollutant", list(POLLUTANT_BREAKPOINTS))
+def test_calculate_aqi_array_matches_calculate_aqi(pollutant, scale):
+    values = _test_values(pollutant)
+    np.testing.assert_allclose(
+        calculate_aqi_array(values, pollutant, scale=scale), _expected(values, pollutant, scale), rtol=1e-12, equal_nan=True
+    )
+
+
+@pytest.mark.parametrize("scale", [False, True])
+@pytest.mark.parametrize("value, pollutant", [(30.5, 'pm25'), (1.05, 'co'), (748, 'o3'), (748.5, 'o3')])
+def test_gaps_and_overlaps(value, pollutant, scale):
+    # Gaps map to NaN like calculate_aqi's None; 748 o3 takes the first range that contains it
+    expected = _expected([value], pollutant, scale)
+    np.testing.assert_allclose(calculate_aqi_array([value], pollutant, scale=scale), expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("scale", [False, True])
+def test_calculate_aqi_batch_matches_row_by_row(scale):
+    df = pd.DataFrame({pollutant: _test_values(pollutant)[:2000] for pollutant in POLLUTANT_BREAKPOINTS})
+    df.iloc[::7, :] = np.nan  # Rows where no pollutant has a reading
+    result = calculate_aqi_batch(df, scale=scale)
+
+    expected = pd.DataFrame({
+        f'AQI_{pollutant}': _expected(df[pollutant].to_numpy(), pollutant, scale) for pollutant in POLLUTANT_BREAKPOINTS
+    }, index=df.index)
+    expected['AQI'] = expected.max(axis=1)
+    pd.testing.assert_frame_equal(result, expected, rtol=1e-12)
@@ -0,0 +1,14 @@
+# test_query_plans.py
+
+import os
+import pytest
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("DATABASE_URL", "").startswith("postgresql"),
+    reason="needs a PostgreSQL DATABASE_URL",
+)
+
+
+def test_hot_queries_use_their_indexes():
+    from scripts.query_plans import check_plans
+    assert check_plans() == []